@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from server import client, db, rebuild_stats_counters, stats_key
+
+ACTIVE = {"statut": {"$ne": "annulee"}}
+
+async def write_batches(collection, rows, to_operation, batch_size: int) -> int:
+    operations = []
+    written = 0
+    async for row in rows:
+        operations.append(to_operation(row))
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+async def backfill_stats(batch_size: int):
+    """Rebuild stats_daily and stats_daily_produits from commandes and reservations.
+
+    Grouping runs inside MongoDB; only one row per day (or per day and
+    product) comes back and is upserted in batches. Writes made while the
+    backfill runs are reapplied on top, so run it during a quiet period.
+    """
+    try:
+        print("Clearing rollups...")
+        await db.stats_daily.delete_many({})
+        await db.stats_daily_produits.delete_many({})
+        
+        print("Rolling up sales per day...")
+        # $toDate also accepts the ISO strings left by a pending migrate_dates.py
+        day = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$created_at"}}}
+        sales = db.commandes.aggregate([
+            {"$match": ACTIVE},
+            {"$group": {"_id": day, "commandes": {"$sum": 1}, "revenue": {"$sum": "$total"}}}
+        ], allowDiskUse=True)
+        days = await write_batches(db.stats_daily, sales, lambda row: UpdateOne(
+            {"_id": row["_id"]},
+            {"$set": {"commandes": row["commandes"], "revenue": row["revenue"]}},
+            upsert=True
+        ), batch_size)
+        print(f"   {days} day(s)")
+        
+        print("Rolling up products per day...")
+        produits = db.commandes.aggregate([
+            {"$match": ACTIVE},
+            # Oldest first, so $last keeps the most recent name and unit
+            {"$sort": {"created_at": 1, "id": 1}},
+            {"$unwind": "$items"},
+            {"$group": {
+                "_id": {"day": day, "produit_id": "$items.produit_id"},
+                "nom": {"$last": "$items.nom"},
+                "unite": {"$last": "$items.unite"},
+                "quantite": {"$sum": "$items.quantite"},
+                "revenue": {"$sum": {"$multiply": ["$items.prix", "$items.quantite"]}}
+            }}
+        ], allowDiskUse=True)
+        rows = await write_batches(db.stats_daily_produits, produits, lambda row: UpdateOne(
+            {"_id": f"{row['_id']['day']}|{row['_id']['produit_id']}"},
+            {"$set": {
+                "day": row["_id"]["day"],
+                "produit_id": row["_id"]["produit_id"],
+                "nom": row["nom"],
+                "unite": row["unite"],
+                "quantite": row["quantite"],
+                "revenue": row["revenue"]
+            }},
+            upsert=True
+        ), batch_size)
+        print(f"   {rows} day/product row(s)")
+        
+        print("Rolling up attendance per visit day...")
+        attendance = db.reservations.aggregate([
+            {"$match": ACTIVE},
+            {"$group": {
+                "_id": {"day": "$date_visite", "type_visite": "$type_visite"},
+                "reservations": {"$sum": 1},
+                "adultes": {"$sum": "$nb_adultes"},
+                "enfants": {"$sum": "$nb_enfants"}
+            }}
+        ], allowDiskUse=True)
+        rows = await write_batches(db.stats_daily, attendance, lambda row: UpdateOne(
+            {"_id": row["_id"]["day"]},
+            {
+                "$inc": {"reservations": row["reservations"]},
+                "$set": {f"visiteurs.{stats_key(row['_id']['type_visite'])}": {"adultes": row["adultes"], "enfants": row["enfants"]}}
+            },
+            upsert=True
+        ), batch_size)
+        print(f"   {rows} day/type row(s)")
+        
+        await rebuild_stats_counters()
+        print("✅ Analytics rollups rebuilt")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the daily analytics rollups")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(backfill_stats(args.batch_size))
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,59 @@
+"""Rendering cost of the confirmation emails.
+
+Usage: python benchmarks/bench_email_templates.py [--repeat N]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import Commande, CommandeItem, Reservation, email_service
+
+def make_commande(nb_items: int) -> Commande:
+    items = [
+        CommandeItem(produit_id=f"p{i}", nom=f"Produit {i}", prix=2.5 + i, quantite=1 + i % 3, unite="kg")
+        for i in range(nb_items)
+    ]
+    return Commande(
+        user_id="u1",
+        user_name="Jean Dupont",
+        user_email="jean@example.com",
+        user_telephone="+243000000000",
+        items=items,
+        mode_retrait="livraison",
+        adresse_livraison="12 avenue du Parc, Kinshasa",
+        total=sum(item.prix * item.quantite for item in items)
+    )
+
+def bench(label: str, func, repeat: int):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    print(f"{label:<32} {best * 1e6:10.1f} µs/email")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    reservation = Reservation(
+        user_id="u1",
+        user_name="Jean Dupont",
+        user_email="jean@example.com",
+        user_telephone="+243000000000",
+        date_visite="2025-06-01",
+        heure_visite="10:00",
+        type_visite="guidee",
+        nb_adultes=2,
+        nb_enfants=3,
+        prix_total=35.0
+    )
+    bench("reservation", lambda: email_service.reservation_confirmation(reservation), args.repeat)
+    for nb_items in (1, 10, 100):
+        commande = make_commande(nb_items)
+        bench(f"commande ({nb_items} items)", lambda: email_service.commande_confirmation(commande), args.repeat)
+
+if __name__ == "__main__":
+    main()
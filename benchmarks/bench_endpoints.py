@@ -0,0 +1,192 @@
+"""Latency percentiles and throughput per endpoint on a synthetic dataset.
+
+Loads data with generate_data.py, then drives each scenario in-process
+through harness.call with a fixed concurrency and reports p50/p95/p99/max
+latency and requests per second. --output saves the results as JSON;
+--baseline compares p95 against a previous run and exits non-zero when an
+endpoint regressed by more than --max-regression.
+
+Usage: python benchmarks/bench_endpoints.py [--requests 200] [--concurrency 10] [--only commandes]
+                                           [--output results.json] [--baseline results.json] [--memory]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from generate_data import generate_data
+from harness import add_memory_argument, call, setup_database
+
+import server
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def build_scenarios(dataset, rng: random.Random) -> list:
+    """Each scenario maps a name to a function returning call() keyword arguments."""
+    admin_token = server.create_token(dataset.admin_ids[0], server.UserRole.ADMIN.value)
+    client_tokens = [server.create_token(user_id, server.UserRole.CLIENT.value) for user_id in dataset.client_ids[:50]]
+    today = datetime.now(timezone.utc).date()
+
+    def client():
+        return rng.choice(client_tokens)
+
+    def future_day(start: int = 1, end: int = 60) -> str:
+        return (today + timedelta(days=rng.randint(start, end))).isoformat()
+
+    return [
+        ("GET /api/produits", lambda: {"method": "GET", "path": "/api/produits"}),
+        ("GET /api/produits?categorie", lambda: {"method": "GET", "path": "/api/produits", "query": "categorie=Fruits"}),
+        ("GET /api/produits/{id}", lambda: {"method": "GET", "path": f"/api/produits/{rng.choice(dataset.produit_ids)}"}),
+        ("GET /api/animaux", lambda: {"method": "GET", "path": "/api/animaux"}),
+        ("GET /api/reservations/disponibilites", lambda: {
+            "method": "GET", "path": "/api/reservations/disponibilites",
+            "query": f"from={today.isoformat()}&to={(today + timedelta(days=30)).isoformat()}"
+        }),
+        ("GET /api/reservations/mes-reservations", lambda: {"method": "GET", "path": "/api/reservations/mes-reservations", "token": client()}),
+        ("GET /api/commandes/mes-commandes", lambda: {"method": "GET", "path": "/api/commandes/mes-commandes", "token": client()}),
+        ("GET /api/admin/reservations", lambda: {"method": "GET", "path": "/api/admin/reservations", "token": admin_token}),
+        ("GET /api/admin/commandes", lambda: {"method": "GET", "path": "/api/admin/commandes", "token": admin_token}),
+        ("GET /api/admin/stats", lambda: {"method": "GET", "path": "/api/admin/stats", "token": admin_token}),
+        ("POST /api/commandes", lambda: {
+            "method": "POST", "path": "/api/commandes", "token": client(),
+            "json_body": {
+                "items": [{"produit_id": produit_id, "quantite": rng.randint(1, 3)} for produit_id in rng.sample(dataset.visible_produit_ids, k=2)],
+                "mode_retrait": "retrait"
+            }
+        }),
+        ("POST /api/reservations", lambda: {
+            "method": "POST", "path": "/api/reservations", "token": client(),
+            "json_body": {
+                "date_visite": future_day(61, 120), "heure_visite": rng.choice(server.VISIT_SLOT_HOURS),
+                "type_visite": "standard", "nb_adultes": 1, "nb_enfants": rng.randint(0, 2)
+            }
+        }),
+        ("POST /api/auth/login", lambda: {
+            "method": "POST", "path": "/api/auth/login",
+            "json_body": {"email": f"user{rng.randint(0, len(dataset.client_ids) - 1) + len(dataset.admin_ids)}@bench.mikombopark.com", "password": "bench-password"}
+        }),
+    ]
+
+async def run_scenario(name: str, make_request, requests: int, concurrency: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await call(**make_request())
+
+    latencies = []
+    errors = {}
+    queue = iter(range(requests))
+
+    async def worker():
+        for _ in queue:
+            kwargs = make_request()
+            started = time.perf_counter()
+            response = await call(**kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status >= 400:
+                errors[response.status] = errors.get(response.status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+def print_table(results: list):
+    print(f"{'endpoint':<42} {'n':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8}")
+    for row in results:
+        errors = sum(row["errors"].values())
+        print(
+            f"{row['endpoint']:<42} {row['requests']:>6} {errors:>5} {row['p50_ms']:>9.2f} "
+            f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['max_ms']:>9.2f} {row['rps']:>8.1f}"
+        )
+
+def compare(results: list, baseline_path: str, max_regression: float, min_delta_ms: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {row["endpoint"]: row for row in json.load(f)["results"]}
+    ok = True
+    for row in results:
+        previous = baseline.get(row["endpoint"])
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = row["p95_ms"] / previous["p95_ms"] - 1
+        # Ignore sub-millisecond jitter on very fast endpoints
+        if change > max_regression and row["p95_ms"] - previous["p95_ms"] > min_delta_ms:
+            ok = False
+            print(f"❌ {row['endpoint']}: p95 {previous['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms ({change:+.0%})")
+    if ok:
+        print(f"✅ no endpoint regressed by more than {max_regression:.0%} at p95")
+    return ok
+
+async def main(args) -> bool:
+    # Keep incidental costs out of the numbers unless asked for
+    server.auth_limiter.limits = {"ip": (10**9, 10**9), "email": (10**9, 10**9)}
+    if args.bcrypt_rounds:
+        server.BCRYPT_ROUNDS = args.bcrypt_rounds
+
+    database = await setup_database(args.memory)
+    print(f"Generating data ({args.reservations} reservations, {args.commandes} commandes)...")
+    dataset = await generate_data(
+        database,
+        users=args.users,
+        produits=args.produits,
+        reservations=args.reservations,
+        commandes=args.commandes,
+        seed=args.seed
+    )
+
+    rng = random.Random(args.seed)
+    results = []
+    for name, make_request in build_scenarios(dataset, rng):
+        if args.only and args.only not in name:
+            continue
+        results.append(await run_scenario(name, make_request, args.requests, args.concurrency, args.warmup))
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "date": datetime.now(timezone.utc).isoformat(),
+                "backend": "memory" if args.memory else "mongod",
+                "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+                "results": results
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        return compare(results, args.baseline, args.max_regression, args.min_delta_ms)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", help="run endpoints whose name contains this text")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--produits", type=int, default=200)
+    parser.add_argument("--reservations", type=int, default=10000)
+    parser.add_argument("--commandes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS for the login scenario")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase vs baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 increases smaller than this")
+    add_memory_argument(parser)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,86 @@
+"""Per-image cost of the photo variant pipeline.
+
+Generates synthetic photos of typical camera sizes, then times
+render_variants() on each (variants deleted between runs) and the
+throughput of the process pool on a batch.
+
+Usage: python benchmarks/bench_image_variants.py [--repeat N] [--batch N] [--workers N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+from PIL import Image, ImageDraw
+
+from server import render_variants
+
+SIZES = {"1280x960": (1280, 960), "3000x2000": (3000, 2000), "4032x3024": (4032, 3024)}
+
+def make_photo(directory: Path, label: str, size: tuple, fmt: str) -> Path:
+    image = Image.radial_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size[0], 97):
+        draw.line([(i, 0), (size[0] - i, size[1])], fill=(i % 255, 120, 200 - i % 200), width=9)
+    path = directory / f"{label}.{'jpg' if fmt == 'JPEG' else 'png'}"
+    image.save(path, format=fmt, quality=92)
+    return path
+
+def clear_variants(source: Path):
+    for variant in source.parent.glob(f"{source.stem}_*"):
+        variant.unlink()
+
+def bench_single(source: Path, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        clear_variants(source)
+        start = time.perf_counter()
+        render_variants(str(source))
+        timings.append(time.perf_counter() - start)
+    variants_size = sum(p.stat().st_size for p in source.parent.glob(f"{source.stem}_*"))
+    print(
+        f"{source.name:<16} {source.stat().st_size / 1024:8.0f} KiB  "
+        f"median {statistics.median(timings) * 1000:7.1f} ms  "
+        f"best {min(timings) * 1000:7.1f} ms  variants {variants_size / 1024:6.0f} KiB"
+    )
+
+def bench_pool(sources: list, workers: int):
+    for source in sources:
+        clear_variants(source)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(render_variants, [str(sources[0])]))  # warm up workers
+        clear_variants(sources[0])
+        start = time.perf_counter()
+        list(executor.map(render_variants, [str(source) for source in sources]))
+        elapsed = time.perf_counter() - start
+    print(f"pool x{workers}: {len(sources)} images in {elapsed:.2f}s ({len(sources) / elapsed:.1f} images/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for label, size in SIZES.items():
+            for fmt in ("JPEG", "PNG"):
+                bench_single(make_photo(directory, label, size, fmt), args.repeat)
+        
+        batch_dir = directory / "batch"
+        batch_dir.mkdir()
+        sources = [make_photo(batch_dir, f"photo{i}", SIZES["3000x2000"], "JPEG") for i in range(args.batch)]
+        bench_pool(sources, 1)
+        if args.workers > 1:
+            bench_pool(sources, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare the validated response_model path with the orjson fast path.
+
+Builds commande documents shaped like the ones stored by create_commande
+(3 items each) and serializes them both ways, for 1k, 10k and 100k rows.
+
+Usage: python benchmarks/bench_json_serialization.py [--sizes 1000,10000,100000]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from harness import server
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+def make_docs(count: int) -> list:
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(count):
+        items = [
+            {"produit_id": str(uuid.uuid4()), "nom": f"Produit {j}", "prix": 2.5 + j, "quantite": 1.0 + j, "unite": "kg"}
+            for j in range(3)
+        ]
+        docs.append({
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "user_name": "Jean Dupont",
+            "user_email": "jean@example.com",
+            "user_telephone": "+243000000000",
+            "items": items,
+            "mode_retrait": "livraison",
+            "adresse_livraison": "12 avenue du Parc",
+            "statut": "confirmee",
+            "total": sum(item["prix"] * item["quantite"] for item in items),
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i)
+        })
+    return docs
+
+def response_field():
+    for route in server.app.routes:
+        if getattr(route, "path", None) == "/api/admin/commandes":
+            return route.response_field
+    raise RuntimeError("admin commandes route not found")
+
+async def validated_path(field, docs) -> bytes:
+    content = await serialize_response(field=field, response_content=docs, is_coroutine=True)
+    return JSONResponse(content).body
+
+def fast_path(docs) -> bytes:
+    return server.FastJSONResponse(content=docs).body
+
+def timed(func, repeat: int) -> tuple:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(func())
+        best = min(best, time.perf_counter() - started)
+    return best, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    if server.orjson is None:
+        print("⚠️  orjson not installed, the fast path falls back to the stdlib encoder")
+    field = response_field()
+    loop = asyncio.new_event_loop()
+    print(f"{'documents':>10} {'validated (s)':>14} {'fast (s)':>10} {'validated docs/s':>17} {'fast docs/s':>12} {'speedup':>8}")
+    for count in (int(size) for size in args.sizes.split(",")):
+        docs = make_docs(count)
+        slow, slow_bytes = timed(lambda: loop.run_until_complete(validated_path(field, docs)), args.repeat)
+        fast, fast_bytes = timed(lambda: fast_path(docs), args.repeat)
+        print(f"{count:>10} {slow:>14.3f} {fast:>10.3f} {count / slow:>17,.0f} {count / fast:>12,.0f} {slow / fast:>7.1f}x")
+    loop.close()
+
+if __name__ == "__main__":
+    main()
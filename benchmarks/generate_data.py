@@ -0,0 +1,218 @@
+"""Bulk-load synthetic users, produits, animaux, reservations and commandes.
+
+Documents are built from the server models and written with insert_many in
+batches, together with the visit slot counters and dashboard counters the
+app maintains, so the dataset looks like one produced through the API.
+The same --seed always yields the same data (ids and dates aside).
+
+Usage: python benchmarks/generate_data.py [--users 1000] [--produits 200] [--animaux 50]
+                                          [--reservations 10000] [--commandes 10000] [--memory]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from harness import add_memory_argument, setup_database
+
+import server
+
+CATEGORIES = ["Fruits", "Légumes", "Produits laitiers", "Viandes", "Oeufs", "Miel"]
+UNITES = ["kg", "piece", "litre", "douzaine", "pot"]
+ESPECES = ["Lion", "Girafe", "Zèbre", "Perroquet", "Tortue", "Chèvre", "Autruche"]
+TYPES_VISITE = ["standard", "guidee", "scolaire"]
+
+@dataclass
+class Dataset:
+    admin_ids: list = field(default_factory=list)
+    client_ids: list = field(default_factory=list)
+    produit_ids: list = field(default_factory=list)
+    visible_produit_ids: list = field(default_factory=list)
+    animal_ids: list = field(default_factory=list)
+    counts: dict = field(default_factory=dict)
+
+async def insert_batches(collection, docs: list, batch_size: int) -> int:
+    for start in range(0, len(docs), batch_size):
+        await collection.insert_many(docs[start:start + batch_size], ordered=False)
+    return len(docs)
+
+def random_moment(rng: random.Random, now: datetime, days_back: int) -> datetime:
+    return now - timedelta(seconds=rng.randint(0, days_back * 86400))
+
+async def generate_data(
+    database,
+    users: int = 1000,
+    produits: int = 200,
+    animaux: int = 50,
+    reservations: int = 10000,
+    commandes: int = 10000,
+    seed: int = 42,
+    batch_size: int = 1000,
+    days_back: int = 180
+) -> Dataset:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    dataset = Dataset()
+    # One real bcrypt hash shared by every user keeps login benchmarks realistic
+    password_hash = server.hash_password("bench-password")
+
+    user_docs = []
+    for i in range(users):
+        role = server.UserRole.ADMIN if i < max(1, users // 100) else server.UserRole.CLIENT
+        user = server.User(
+            email=f"user{i}@bench.mikombopark.com",
+            nom=f"Nom{i}",
+            prenom=f"Prenom{i}",
+            telephone=f"+243{rng.randint(100000000, 999999999)}",
+            role=role,
+            created_at=random_moment(rng, now, days_back)
+        )
+        (dataset.admin_ids if role == server.UserRole.ADMIN else dataset.client_ids).append(user.id)
+        user_docs.append({**user.model_dump(), "password_hash": password_hash})
+    dataset.counts["users"] = await insert_batches(database.users, user_docs, batch_size)
+    users_by_id = {doc["id"]: doc for doc in user_docs}
+
+    produit_docs = []
+    for i in range(produits):
+        produit = server.Produit(
+            nom=f"Produit {i}",
+            categorie=rng.choice(CATEGORIES),
+            description=f"Produit de la ferme numéro {i}",
+            prix=round(rng.uniform(0.5, 40), 2),
+            unite=rng.choice(UNITES),
+            stock=1_000_000,
+            saison=rng.random() < 0.3,
+            visible=rng.random() < 0.9,
+            created_at=random_moment(rng, now, days_back)
+        )
+        dataset.produit_ids.append(produit.id)
+        produit_docs.append(produit.model_dump())
+    dataset.counts["produits"] = await insert_batches(database.produits, produit_docs, batch_size)
+    visible_produits = [doc for doc in produit_docs if doc["visible"]]
+    dataset.visible_produit_ids = [doc["id"] for doc in visible_produits]
+
+    animal_docs = []
+    for i in range(animaux):
+        animal = server.Animal(
+            espece=rng.choice(ESPECES),
+            nom=f"Animal {i}",
+            enclos=f"Enclos {rng.randint(1, 12)}",
+            description="Pensionnaire du parc",
+            created_at=random_moment(rng, now, days_back)
+        )
+        dataset.animal_ids.append(animal.id)
+        animal_docs.append(animal.model_dump())
+    dataset.counts["animaux"] = await insert_batches(database.animaux, animal_docs, batch_size)
+
+    reservation_docs = []
+    slots = {}
+    for _ in range(reservations):
+        user = users_by_id[rng.choice(dataset.client_ids or dataset.admin_ids)]
+        created_at = random_moment(rng, now, days_back)
+        date_visite = (created_at + timedelta(days=rng.randint(1, 60))).strftime("%Y-%m-%d")
+        heure_visite = rng.choice(server.VISIT_SLOT_HOURS)
+        nb_adultes, nb_enfants = rng.randint(1, 4), rng.randint(0, 4)
+        type_visite = rng.choice(TYPES_VISITE)
+        reservation = server.Reservation(
+            user_id=user["id"],
+            user_name=f"{user['prenom']} {user['nom']}",
+            user_email=user["email"],
+            user_telephone=user["telephone"],
+            date_visite=date_visite,
+            heure_visite=heure_visite,
+            type_visite=type_visite,
+            nb_adultes=nb_adultes,
+            nb_enfants=nb_enfants,
+            prix_total=server.visit_price(type_visite, nb_adultes, nb_enfants),
+            statut=rng.choice(list(server.ReservationStatus)),
+            created_at=created_at
+        )
+        reservation_docs.append(reservation.model_dump())
+        if reservation.statut != server.ReservationStatus.ANNULEE:
+            slot = slots.setdefault((date_visite, heure_visite), [0, 0])
+            slot[0] += nb_adultes + nb_enfants
+            slot[1] += 1
+    dataset.counts["reservations"] = await insert_batches(database.reservations, reservation_docs, batch_size)
+
+    days = {}
+    slot_docs = []
+    for (date_visite, heure_visite), (booked, count) in slots.items():
+        slot_docs.append({
+            "_id": server.slot_key(date_visite, heure_visite), "date_visite": date_visite,
+            "heure_visite": heure_visite, "booked": booked, "reservations": count,
+            # Generated bookings ignore capacity; raise it so counters stay valid
+            "capacity": max(server.VISIT_SLOT_CAPACITY, booked)
+        })
+        totals = days.setdefault(date_visite, [0, 0])
+        totals[0] += booked
+        totals[1] += count
+    await insert_batches(database.visit_slots, slot_docs, batch_size)
+    await insert_batches(database.visit_days, [
+        {"_id": day, "booked": booked, "reservations": count} for day, (booked, count) in days.items()
+    ], batch_size)
+
+    commande_docs = []
+    for _ in range(commandes):
+        user = users_by_id[rng.choice(dataset.client_ids or dataset.admin_ids)]
+        items = [
+            server.CommandeItem(produit_id=p["id"], nom=p["nom"], prix=p["prix"], quantite=rng.randint(1, 5), unite=p["unite"])
+            for p in rng.sample(visible_produits, k=min(len(visible_produits), rng.randint(1, 4)))
+        ]
+        mode_retrait = rng.choice(["retrait", "livraison"])
+        created_at = random_moment(rng, now, days_back)
+        commande = server.Commande(
+            user_id=user["id"],
+            user_name=f"{user['prenom']} {user['nom']}",
+            user_email=user["email"],
+            user_telephone=user["telephone"],
+            items=items,
+            mode_retrait=mode_retrait,
+            adresse_livraison="Avenue du Parc, Kinshasa" if mode_retrait == "livraison" else "",
+            statut=rng.choice(list(server.CommandeStatus)),
+            total=round(sum(item.prix * item.quantite for item in items), 2),
+            created_at=created_at,
+            updated_at=created_at
+        )
+        commande_docs.append(commande.model_dump())
+    dataset.counts["commandes"] = await insert_batches(database.commandes, commande_docs, batch_size)
+
+    await server.rebuild_stats_counters()
+    return dataset
+
+async def main(args) -> Dataset:
+    database = await setup_database(args.memory)
+    started = time.perf_counter()
+    dataset = await generate_data(
+        database,
+        users=args.users,
+        produits=args.produits,
+        animaux=args.animaux,
+        reservations=args.reservations,
+        commandes=args.commandes,
+        seed=args.seed,
+        batch_size=args.batch_size
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(dataset.counts.values())
+    print(", ".join(f"{count} {name}" for name, count in dataset.counts.items()))
+    print(f"✅ {total} documents in {elapsed:.2f}s ({total / elapsed:.0f} docs/s) into {server.db.name}")
+    return dataset
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--produits", type=int, default=200)
+    parser.add_argument("--animaux", type=int, default=50)
+    parser.add_argument("--reservations", type=int, default=10000)
+    parser.add_argument("--commandes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    add_memory_argument(parser)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except Exception as e:
+        print(f"❌ Data generation failed: {e}")
+        sys.exit(1)
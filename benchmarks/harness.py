@@ -0,0 +1,117 @@
+"""Drive the FastAPI app in-process against a scratch database.
+
+Benchmarks never touch the database configured in .env: they connect to
+BENCH_MONGO_URL (default mongodb://localhost:27017) and use the
+BENCH_DB_NAME database, which is dropped on setup. Pass memory=True to
+use mongomock-motor as an in-memory stand-in when no mongod is available.
+Memory mode checks logic only: each mongomock operation runs to completion
+before the next one starts, so the load scripts' races are not exercised
+(tests/test_concurrency.py runs them against a real mongod) and timings
+say little about MongoDB.
+"""
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ["MONGO_URL"] = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("EMAIL_TRANSPORT", "fake")
+os.environ.setdefault("EMAIL_WORKER_ENABLED", "false")
+os.environ.setdefault("ENSURE_INDEXES_ON_STARTUP", "false")
+
+import server  # noqa: E402
+
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "mikombo_bench")
+
+def add_memory_argument(parser):
+    parser.add_argument("--memory", action="store_true", help="use mongomock-motor instead of a local mongod (logic only, see harness.py)")
+
+async def setup_database(memory: bool = False):
+    """Point the app at a fresh scratch database and build its indexes."""
+    if memory:
+        from mongomock_motor import AsyncMongoMockClient
+        database = AsyncMongoMockClient()[BENCH_DB_NAME]
+    else:
+        await server.client.drop_database(BENCH_DB_NAME)
+        database = server.client[BENCH_DB_NAME]
+    server.db = database
+    server.user_cache.clear()
+    await server.ensure_indexes(database)
+    return database
+
+async def create_user(database, role: str = "client") -> tuple:
+    """Insert a user directly (no bcrypt) and return (user_id, bearer token)."""
+    user_id = str(uuid.uuid4())
+    await database.users.insert_one({
+        "id": user_id,
+        "email": f"{user_id[:8]}@bench.mikombopark.com",
+        "nom": "Bench",
+        "prenom": role.capitalize(),
+        "telephone": "+243000000000",
+        "role": role,
+        "password_hash": "",
+        "created_at": datetime.now(timezone.utc)
+    })
+    return user_id, server.create_token(user_id, role)
+
+class Response:
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+async def call(method: str, path: str, json_body=None, token: str = None, headers: dict = None, query: str = "") -> Response:
+    """Minimal ASGI client: sends one HTTP request straight into server.app."""
+    body = json.dumps(json_body).encode("utf-8") if json_body is not None else b""
+    raw_headers = [(b"host", b"bench")]
+    if json_body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+    if token:
+        raw_headers.append((b"authorization", f"Bearer {token}".encode("ascii")))
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode("ascii"), value.encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "query_string": query.encode("ascii"),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status = 500
+    response_headers = {}
+    chunks = []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update({k.decode("latin-1"): v.decode("latin-1") for k, v in message.get("headers", [])})
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await server.app(scope, receive, send)
+    return Response(status, response_headers, b"".join(chunks))
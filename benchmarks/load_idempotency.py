@@ -0,0 +1,101 @@
+"""Fire parallel duplicate requests sharing an Idempotency-Key and check each runs once.
+
+For both POST /api/commandes and POST /api/reservations, every group of
+duplicates must yield one stored document, one queued email and identical
+responses. A reused key with a different body must be rejected.
+
+Usage: python benchmarks/load_idempotency.py [--keys 20] [--duplicates 10] [--memory]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from harness import add_memory_argument, call, create_user, setup_database
+
+import server
+
+async def fire(path: str, payloads: list, token: str, duplicates: int) -> list:
+    """Send `duplicates` copies of each payload at once, one fresh key per payload."""
+    keys = [str(uuid.uuid4()) for _ in payloads]
+    requests = [
+        call("POST", path, payload, token=token, headers={"Idempotency-Key": key})
+        for key, payload in zip(keys, payloads)
+        for _ in range(duplicates)
+    ]
+    responses = await asyncio.gather(*requests)
+    return [responses[i * duplicates:(i + 1) * duplicates] for i in range(len(payloads))]
+
+def check_groups(label: str, groups: list, stored: int, emails: int, elapsed: float) -> bool:
+    statuses = {}
+    consistent = 0
+    for group in groups:
+        for response in group:
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+        ids = {response.json().get("id") for response in group if response.status == 200}
+        replays = sum(1 for response in group if response.headers.get("idempotent-replayed") == "true")
+        if len(ids) == 1 and replays == len(group) - 1:
+            consistent += 1
+    total = sum(statuses.values())
+    print(f"{label}: {total} requests for {len(groups)} keys in {elapsed:.2f}s, statuses {statuses}")
+    print(f"  {stored} stored, {emails} emails queued, {consistent}/{len(groups)} groups with one id")
+    return statuses == {200: total} and stored == len(groups) and emails == len(groups) and consistent == len(groups)
+
+async def run(keys: int, duplicates: int, memory: bool) -> bool:
+    database = await setup_database(memory)
+    _, admin_token = await create_user(database, "admin")
+    _, token = await create_user(database)
+    created = await call("POST", "/api/admin/produits", {
+        "nom": "Ananas", "categorie": "Fruits", "description": "Idempotence",
+        "prix": 2.0, "unite": "piece", "stock": keys * duplicates
+    }, token=admin_token)
+    produit_id = created.json()["id"]
+    
+    commandes = [{"items": [{"produit_id": produit_id, "quantite": 1}], "mode_retrait": "retrait"} for _ in range(keys)]
+    started = time.perf_counter()
+    groups = await fire("/api/commandes", commandes, token, duplicates)
+    elapsed = time.perf_counter() - started
+    ok = check_groups(
+        "commandes", groups,
+        await database.commandes.count_documents({}),
+        await database.email_outbox.count_documents({"kind": "commande_confirmation"}),
+        elapsed
+    )
+    produit = await database.produits.find_one({"id": produit_id})
+    print(f"  stock {keys * duplicates} -> {produit['stock']}")
+    ok = ok and produit["stock"] == keys * duplicates - keys
+    
+    date_visite = (datetime.now(timezone.utc) + timedelta(days=7)).strftime("%Y-%m-%d")
+    reservations = [{
+        "date_visite": date_visite, "heure_visite": server.VISIT_SLOT_HOURS[i % len(server.VISIT_SLOT_HOURS)],
+        "type_visite": "standard", "nb_adultes": 1, "nb_enfants": 0
+    } for i in range(keys)]
+    started = time.perf_counter()
+    groups = await fire("/api/reservations", reservations, token, duplicates)
+    elapsed = time.perf_counter() - started
+    ok = check_groups(
+        "reservations", groups,
+        await database.reservations.count_documents({}),
+        await database.email_outbox.count_documents({"kind": "reservation_confirmation"}),
+        elapsed
+    ) and ok
+    
+    key = str(uuid.uuid4())
+    first = await call("POST", "/api/commandes", commandes[0], token=token, headers={"Idempotency-Key": key})
+    changed = dict(commandes[0], mode_retrait="livraison", adresse_livraison="Kinshasa")
+    second = await call("POST", "/api/commandes", changed, token=token, headers={"Idempotency-Key": key})
+    print(f"key reused with another body: {first.status} then {second.status}")
+    ok = ok and first.status == 200 and second.status == 422
+    
+    print("✅ each key ran once" if ok else "❌ idempotency violated")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keys", type=int, default=20)
+    parser.add_argument("--duplicates", type=int, default=10)
+    add_memory_argument(parser)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.keys, args.duplicates, args.memory)) else 1)
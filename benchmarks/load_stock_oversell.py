@@ -0,0 +1,56 @@
+"""Fire many simultaneous orders at a low-stock product and check it is never oversold.
+
+Usage: python benchmarks/load_stock_oversell.py [--orders 300] [--stock 25] [--memory]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from harness import add_memory_argument, call, create_user, setup_database
+
+async def run(orders: int, stock: int, users: int, memory: bool) -> bool:
+    database = await setup_database(memory)
+    _, admin_token = await create_user(database, "admin")
+    created = await call("POST", "/api/admin/produits", {
+        "nom": "Mangues", "categorie": "Fruits", "description": "Stock limité",
+        "prix": 3.5, "unite": "kg", "stock": stock
+    }, token=admin_token)
+    produit_id = created.json()["id"]
+    tokens = [(await create_user(database))[1] for _ in range(users)]
+    
+    order = {"items": [{"produit_id": produit_id, "quantite": 1}], "mode_retrait": "retrait"}
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        call("POST", "/api/commandes", order, token=tokens[i % users]) for i in range(orders)
+    ))
+    elapsed = time.perf_counter() - started
+    
+    accepted = sum(1 for r in responses if r.status == 200)
+    rejected = sum(1 for r in responses if r.status == 409)
+    errors = orders - accepted - rejected
+    produit = await database.produits.find_one({"id": produit_id})
+    stored = await database.commandes.count_documents({"items.produit_id": produit_id})
+    
+    print(f"{orders} orders in {elapsed:.2f}s: {accepted} accepted, {rejected} rejected, {errors} errors")
+    print(f"stock {stock} -> {produit['stock']}, {stored} commandes stored, holds left: {len(produit.get('stock_holds', []))}")
+    
+    ok = (
+        produit["stock"] >= 0
+        and accepted == min(stock, orders)
+        and stored == accepted
+        and produit["stock"] == stock - accepted
+        and not produit.get("stock_holds")
+        and errors == 0
+    )
+    print("✅ never oversold" if ok else "❌ stock invariant violated")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=25)
+    parser.add_argument("--users", type=int, default=50)
+    add_memory_argument(parser)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.orders, args.stock, args.users, args.memory)) else 1)
@@ -0,0 +1,59 @@
+"""Fire concurrent bookings at one visit slot and check capacity is never exceeded.
+
+Usage: python benchmarks/load_visit_capacity.py [--bookings 200] [--memory]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from harness import add_memory_argument, call, create_user, setup_database
+
+import server
+
+async def run(bookings: int, users: int, memory: bool) -> bool:
+    database = await setup_database(memory)
+    tokens = [(await create_user(database))[1] for _ in range(users)]
+    date_visite = (datetime.now(timezone.utc) + timedelta(days=7)).strftime("%Y-%m-%d")
+    heure_visite = server.VISIT_SLOT_HOURS[0]
+    capacity = server.VISIT_SLOT_CAPACITY
+    
+    rng = random.Random(42)
+    payloads = [{
+        "date_visite": date_visite,
+        "heure_visite": heure_visite,
+        "type_visite": "standard",
+        "nb_adultes": rng.randint(1, 3),
+        "nb_enfants": rng.randint(0, 2)
+    } for _ in range(bookings)]
+    
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        call("POST", "/api/reservations", payload, token=tokens[i % users]) for i, payload in enumerate(payloads)
+    ))
+    elapsed = time.perf_counter() - started
+    
+    accepted = sum(1 for r in responses if r.status == 200)
+    rejected = sum(1 for r in responses if r.status == 409)
+    errors = bookings - accepted - rejected
+    slot = await database.visit_slots.find_one({"_id": server.slot_key(date_visite, heure_visite)}) or {}
+    stored = 0
+    async for reservation in database.reservations.find({"date_visite": date_visite, "heure_visite": heure_visite}):
+        stored += reservation["nb_adultes"] + reservation["nb_enfants"]
+    
+    print(f"{bookings} bookings in {elapsed:.2f}s: {accepted} accepted, {rejected} rejected, {errors} errors")
+    print(f"capacity {capacity}, slot counter {slot.get('booked', 0)}, visitors stored {stored}")
+    
+    ok = slot.get("booked", 0) == stored and stored <= capacity and errors == 0
+    print("✅ capacity enforced" if ok else "❌ capacity invariant violated")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bookings", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    add_memory_argument(parser)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.bookings, args.users, args.memory)) else 1)
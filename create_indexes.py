@@ -0,0 +1,35 @@
+import asyncio
+import sys
+
+from server import client, db, ensure_indexes
+
+async def run_index_migration():
+    print("Reconciling indexes...")
+    try:
+        report = await ensure_indexes(db)
+    finally:
+        client.close()
+    
+    built = 0
+    failed = 0
+    for entry in report:
+        if entry['action'] == "failed":
+            failed += 1
+            print(f"   ❌ {entry['collection']}.{entry['index']}: {entry['error']}")
+            continue
+        print(f"   {entry['collection']}.{entry['index']}: {entry['action']} ({entry['seconds']}s)")
+        if entry['action'] != "exists":
+            built += 1
+    
+    total = sum(entry['seconds'] for entry in report)
+    print(f"✅ {built} index(es) built, {len(report) - built - failed} already up to date ({total:.3f}s)")
+    if failed:
+        raise RuntimeError(f"{failed} index(es) could not be built")
+    return report
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_index_migration())
+    except Exception as e:
+        print(f"❌ Index migration failed: {e}")
+        sys.exit(1)
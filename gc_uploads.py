@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from server import UPLOADS_DIR, client, db
+
+# Collections holding upload URLs, with the fields that reference them
+REFERENCES = {
+    "produits": {"photos": 1, "photo_variants": 1},
+    "animaux": {"photo": 1, "photo_variants": 1},
+}
+
+def add_reference(referenced: set, url):
+    if isinstance(url, str) and url.startswith("/uploads/"):
+        referenced.add(url[len("/uploads/"):])
+
+async def collect_references() -> set:
+    """Return every upload path ("produits/<file>") referenced by a document."""
+    referenced = set()
+    for collection_name, fields in REFERENCES.items():
+        async for doc in db[collection_name].find({}, {"_id": 0, **fields}):
+            add_reference(referenced, doc.get("photo"))
+            for url in doc.get("photos") or []:
+                add_reference(referenced, url)
+            variants = doc.get("photo_variants") or []
+            for entry in variants if isinstance(variants, list) else [variants]:
+                for url in entry.values():
+                    add_reference(referenced, url)
+    return referenced
+
+def is_referenced(subdir: str, name: str, referenced: set, referenced_stems: set) -> bool:
+    if f"{subdir}/{name}" in referenced:
+        return True
+    # Variants not recorded on the document still belong to their original
+    stem = name.rpartition(".")[0]
+    original_stem, sep, _ = stem.rpartition("_")
+    return bool(sep) and f"{subdir}/{original_stem}" in referenced_stems
+
+def sweep(referenced: set, grace_seconds: float, dry_run: bool) -> dict:
+    """Delete unreferenced files older than the grace period, per directory.
+
+    The grace period protects uploads written moments before their document
+    is updated. Files are shared between documents (content-addressed names),
+    so this is the only place that removes them.
+    """
+    cutoff = time.time() - grace_seconds
+    referenced_stems = {path.rpartition(".")[0] for path in referenced}
+    report = {}
+    for entry in os.scandir(UPLOADS_DIR):
+        if not entry.is_dir():
+            continue
+        stats = report.setdefault(entry.name, {"files": 0, "bytes": 0, "orphans": 0, "reclaimed": 0, "recent": 0})
+        for file_entry in os.scandir(entry.path):
+            if not file_entry.is_file():
+                continue
+            info = file_entry.stat()
+            stats["files"] += 1
+            stats["bytes"] += info.st_size
+            if is_referenced(entry.name, file_entry.name, referenced, referenced_stems):
+                continue
+            if info.st_mtime > cutoff:
+                stats["recent"] += 1
+                continue
+            stats["orphans"] += 1
+            stats["reclaimed"] += info.st_size
+            if not dry_run:
+                os.unlink(file_entry.path)
+    return report
+
+async def gc_uploads(grace_hours: float, dry_run: bool):
+    try:
+        print("Collecting referenced uploads...")
+        referenced = await collect_references()
+        print(f"{len(referenced)} referenced file(s)")
+        report = await asyncio.to_thread(sweep, referenced, grace_hours * 3600, dry_run)
+        
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        total = 0
+        for subdir, stats in sorted(report.items()):
+            total += stats["reclaimed"]
+            print(
+                f"  {subdir}: {stats['files']} file(s), {stats['bytes'] / 1024 / 1024:.1f} MiB, "
+                f"{stats['orphans']} orphan(s) ({stats['reclaimed'] / 1024 / 1024:.1f} MiB), "
+                f"{stats['recent']} within grace period"
+            )
+        print(f"✅ {verb} {total / 1024 / 1024:.1f} MiB ({total} bytes)")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove uploaded files no document references")
+    parser.add_argument("--grace-hours", type=float, default=24, help="keep unreferenced files younger than this")
+    parser.add_argument("--dry-run", action="store_true", help="report without deleting")
+    args = parser.parse_args()
+    try:
+        asyncio.run(gc_uploads(args.grace_hours, args.dry_run))
+    except Exception as e:
+        print(f"❌ Upload GC failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import sys
+
+from server import client, db, image_pipeline
+
+async def backfill_photo_variants(force: bool):
+    """Generate thumbnail/medium variants for photos uploaded before the pipeline.
+
+    Safe to re-run: documents whose variants are already recorded are skipped
+    unless --force is given, and existing variant files are reused.
+    """
+    try:
+        produits = 0
+        async for produit in db.produits.find({"photos.0": {"$exists": True}}, {"_id": 0, "id": 1, "photos": 1, "photo_variants": 1}):
+            done = {v.get("original") for v in produit.get("photo_variants", [])}
+            todo = [url for url in produit["photos"] if force or url not in done]
+            if not todo:
+                continue
+            variants = [v for v in produit.get("photo_variants", []) if v.get("original") not in todo]
+            for photo_url in todo:
+                try:
+                    variants.append((await image_pipeline.variants(photo_url)).model_dump())
+                except Exception as e:
+                    print(f"❌ Produit {produit['id']}: {photo_url} skipped ({e})")
+            await db.produits.update_one({"id": produit["id"]}, {"$set": {"photo_variants": variants}})
+            produits += 1
+        
+        animaux = 0
+        query = {"photo": {"$nin": ["", None]}}
+        if not force:
+            query["photo_variants"] = None
+        async for animal in db.animaux.find(query, {"_id": 0, "id": 1, "photo": 1}):
+            try:
+                variants = await image_pipeline.variants(animal["photo"])
+            except Exception as e:
+                print(f"❌ Animal {animal['id']}: {animal['photo']} skipped ({e})")
+                continue
+            await db.animaux.update_one({"id": animal["id"]}, {"$set": {"photo_variants": variants.model_dump()}})
+            animaux += 1
+        
+        print(f"✅ Variants generated for {produits} produit(s) and {animaux} animal(s)")
+    finally:
+        image_pipeline.shutdown()
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill photo variants")
+    parser.add_argument("--force", action="store_true", help="regenerate variants already recorded")
+    args = parser.parse_args()
+    try:
+        asyncio.run(backfill_photo_variants(args.force))
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from server import client, db
+
+# Collections and the timestamp fields that used to be stored as ISO strings
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "produits": ["created_at"],
+    "animaux": ["created_at"],
+    "cultures": ["created_at"],
+    "reservations": ["created_at"],
+    "commandes": ["created_at", "updated_at"],
+    "messages": ["created_at"],
+}
+
+CHECKPOINT_PREFIX = "bson_dates:"
+
+def parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+async def migrate_collection(collection_name: str, fields: list, batch_size: int) -> int:
+    """Convert string timestamps to BSON dates, one batch at a time.
+
+    Progress is checkpointed by _id in the `migrations` collection after
+    every batch, so an interrupted run resumes where it stopped.
+    """
+    collection = db[collection_name]
+    checkpoint_id = CHECKPOINT_PREFIX + collection_name
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    converted = checkpoint.get("converted", 0)
+    
+    string_filter = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    
+    while True:
+        query = string_filter if last_id is None else {"$and": [string_filter, {"_id": {"$gt": last_id}}]}
+        docs = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        
+        operations = []
+        for doc in docs:
+            changes = {}
+            for field in fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    try:
+                        changes[field] = parse_date(value)
+                    except ValueError:
+                        print(f"   ⚠️  {collection_name} {doc['_id']}: unparseable {field} {value!r}, skipped")
+            if changes:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+        
+        last_id = docs[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "converted": converted, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        print(f"   {collection_name}: {converted} document(s) converted")
+    
+    await db.migrations.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"completed_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return converted
+
+async def migrate_dates(batch_size: int, restart: bool):
+    try:
+        if restart:
+            await db.migrations.delete_many({"_id": {"$regex": f"^{CHECKPOINT_PREFIX}"}})
+        
+        total = 0
+        for collection_name, fields in DATE_FIELDS.items():
+            print(f"Migrating {collection_name}...")
+            total += await migrate_collection(collection_name, fields, batch_size)
+        print(f"✅ Done, {total} document(s) converted to BSON dates")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert ISO string timestamps to native BSON dates")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and rescan from the start")
+    args = parser.parse_args()
+    try:
+        asyncio.run(migrate_dates(args.batch_size, args.restart))
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
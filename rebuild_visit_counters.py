@@ -0,0 +1,60 @@
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from server import client, db
+
+ACTIVE_RESERVATIONS = {"statut": {"$ne": "annulee"}}
+
+async def rebuild_visit_counters():
+    """Recompute visit_slots and visit_days from the reservations collection.
+
+    Run once after deploying the slot counters, or to repair drift. Slot
+    capacity overrides are preserved; only booked/reservations are reset.
+    """
+    try:
+        print("Aggregating reservations per slot...")
+        slot_ops = []
+        day_totals = {}
+        pipeline = [
+            {"$match": ACTIVE_RESERVATIONS},
+            {"$group": {
+                "_id": {"date_visite": "$date_visite", "heure_visite": "$heure_visite"},
+                "booked": {"$sum": {"$add": ["$nb_adultes", "$nb_enfants"]}},
+                "reservations": {"$sum": 1}
+            }}
+        ]
+        async for row in db.reservations.aggregate(pipeline, allowDiskUse=True):
+            date_visite = row["_id"]["date_visite"]
+            heure_visite = row["_id"]["heure_visite"]
+            slot_ops.append(UpdateOne(
+                {"_id": f"{date_visite}|{heure_visite}"},
+                {"$set": {"date_visite": date_visite, "heure_visite": heure_visite, "booked": row["booked"], "reservations": row["reservations"]}},
+                upsert=True
+            ))
+            totals = day_totals.setdefault(date_visite, [0, 0])
+            totals[0] += row["booked"]
+            totals[1] += row["reservations"]
+        
+        await db.visit_slots.update_many({}, {"$set": {"booked": 0, "reservations": 0}})
+        if slot_ops:
+            await db.visit_slots.bulk_write(slot_ops, ordered=False)
+        
+        await db.visit_days.delete_many({})
+        if day_totals:
+            await db.visit_days.insert_many([
+                {"_id": day, "booked": booked, "reservations": reservations}
+                for day, (booked, reservations) in day_totals.items()
+            ])
+        
+        print(f"✅ {len(slot_ops)} slot(s) and {len(day_totals)} day(s) rebuilt")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(rebuild_visit_counters())
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import sys
+from datetime import timedelta
+
+from server import client, release_stale_stock_holds
+
+async def release_stock_holds(older_than_minutes: float):
+    """Undo stock reservations left behind by orders that crashed mid-request.
+
+    Meant to run periodically (e.g. from cron). The age threshold must be
+    well above the longest order request so in-flight orders are untouched.
+    """
+    try:
+        report = await release_stale_stock_holds(timedelta(minutes=older_than_minutes))
+        print(f"✅ {report['restocked']} hold(s) restocked, {report['confirmed']} hold(s) of stored orders cleared")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Release stale stock holds")
+    parser.add_argument("--older-than-minutes", type=float, default=15)
+    args = parser.parse_args()
+    try:
+        asyncio.run(release_stock_holds(args.older_than_minutes))
+    except Exception as e:
+        print(f"❌ Stock hold release failed: {e}")
+        sys.exit(1)
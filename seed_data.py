@@ -28,7 +28,7 @@ async def seed_database():
         "telephone": "+243123456789",
         "role": "admin",
         "password_hash": admin_password,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     })
     
     print("Creating sample products...")
@@ -47,7 +47,7 @@ async def seed_database():
             **p,
             "photos": [],
             "visible": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
     
     print("Creating sample animals...")
@@ -64,7 +64,7 @@ async def seed_database():
             **a,
             "photo": "",
             "visible": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
     
     print("Creating sample cultures...")
@@ -78,7 +78,7 @@ async def seed_database():
         await db.cultures.insert_one({
             "id": str(uuid.uuid4()),
             **c,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
     
     print("✅ Database seeded successfully!")
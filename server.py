@@ -1,14 +1,18 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Header, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo import monitoring
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
@@ -16,15 +20,254 @@ import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
 import bcrypt
 import jwt
-import shutil
 from enum import Enum
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import time
+import base64
+import json
+import hashlib
+import bisect
+import random
+import string
+import html
+import csv
+import io
+import threading
+import contextvars
+import cProfile
+import pstats
+try:
+    import orjson
+except ImportError:  # optional, only needed for FAST_JSON_RESPONSES
+    orjson = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'true').lower() == 'true'
+PROFILE_TTL_SECONDS = int(os.environ.get('PROFILE_TTL_SECONDS', str(7 * 24 * 3600)))
+PROFILE_MAX_COMMANDS = 200
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _prom_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    """Thread-safe labelled histogram rendered in the Prometheus text format."""
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = _prom_labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_prom_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_prom_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Counter:
+    """Thread-safe labelled counter rendered in the Prometheus text format."""
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_prom_labels(self.label_names, labels)} {value}")
+        return lines
+
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+http_responses = Counter("http_responses_total", "HTTP responses by route template and status", ("method", "route", "status"))
+mongo_command_duration = Histogram("mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command"))
+mongo_command_documents = Counter("mongo_command_documents_total", "Documents returned or written by MongoDB commands", ("collection", "command"))
+mongo_command_failures = Counter("mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+
+def filter_shape(value):
+    """Replace the literal values of a query with "?" but keep fields and operators."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        shapes = []
+        for item in value:
+            shape = filter_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+# Where each command keeps its query, for the slow-query log
+_COMMAND_FILTERS = {
+    "find": lambda cmd: cmd.get("filter"),
+    "count": lambda cmd: cmd.get("query"),
+    "distinct": lambda cmd: cmd.get("query"),
+    "findAndModify": lambda cmd: cmd.get("query"),
+    "update": lambda cmd: [u.get("q") for u in cmd.get("updates", [])],
+    "delete": lambda cmd: [d.get("q") for d in cmd.get("deletes", [])],
+    "aggregate": lambda cmd: [stage for stage in cmd.get("pipeline", []) if "$match" in stage or "$sort" in stage],
+}
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records per-collection/per-command timings and document counts.
+
+    pymongo calls the listener synchronously from the driver threads, so
+    only cheap bookkeeping happens here. Commands slower than
+    MONGO_SLOW_QUERY_MS are logged with the shape of their filter.
+    """
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        command = event.command
+        target = command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = command.get("collection")
+        if not isinstance(target, str):
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (target, command)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        entry = self._finish(event)
+        if entry is None:
+            return
+        collection_name, command = entry
+        labels = (collection_name, event.command_name)
+        seconds = event.duration_micros / 1e6
+        mongo_command_duration.observe(labels, seconds)
+        reply = event.reply
+        cursor = reply.get("cursor")
+        if cursor is not None:
+            documents = len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+        elif event.command_name == "findAndModify":
+            documents = 1 if reply.get("value") else 0
+        else:
+            documents = reply.get("n", 0)
+        mongo_command_documents.inc(labels, documents)
+        profile = active_profile.get()
+        if profile is not None:
+            profile.record(collection_name, event.command_name, command, seconds, documents)
+        if MONGO_SLOW_QUERY_MS and seconds * 1000 >= MONGO_SLOW_QUERY_MS:
+            get_filter = _COMMAND_FILTERS.get(event.command_name)
+            shape = filter_shape(get_filter(command)) if get_filter else None
+            logging.getLogger(__name__).warning(
+                f"Slow Mongo {event.command_name} on {collection_name}: {seconds * 1000:.1f}ms, "
+                f"{documents} doc(s), filter {json.dumps(shape, default=str)}"
+            )
+
+    def failed(self, event):
+        entry = self._finish(event)
+        if entry is not None:
+            mongo_command_failures.inc((entry[0], event.command_name))
+
+mongo_metrics = MongoCommandMetrics()
+
+class RequestProfile:
+    """Mongo commands issued on behalf of one profiled request."""
+    def __init__(self):
+        self.commands = []
+        self.mongo_seconds = 0.0
+        self.mongo_count = 0
+        self._lock = threading.Lock()
+
+    def record(self, collection_name: str, command_name: str, command: dict, seconds: float, documents: int):
+        get_filter = _COMMAND_FILTERS.get(command_name)
+        with self._lock:
+            self.mongo_seconds += seconds
+            self.mongo_count += 1
+            if len(self.commands) < PROFILE_MAX_COMMANDS:
+                self.commands.append({
+                    "collection": collection_name,
+                    "command": command_name,
+                    "ms": round(seconds * 1000, 3),
+                    "documents": documents,
+                    "filter": filter_shape(get_filter(command)) if get_filter else None,
+                })
+
+# Motor runs driver calls in a copy of the caller's context, so the command
+# listener sees the profile of the request that issued the command
+active_profile: contextvars.ContextVar = contextvars.ContextVar("active_profile", default=None)
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its last body chunk is sent.
+
+    Requests are labelled with the matched route template (e.g.
+    /api/admin/produits/{produit_id}) so ids do not explode cardinality.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe((scope["method"], template), time.perf_counter() - started)
+            http_responses.inc((scope["method"], template, str(status)))
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[mongo_metrics] if METRICS_ENABLED else [])
 db = client[os.environ['DB_NAME']]
 
 
@@ -41,7 +284,85 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production'
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 
+# Authenticated user cache
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '10000'))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', '2'))
+PASSWORD_POOL_MAX_PENDING = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', '32'))
+
+# Login/register throttling (token buckets per client IP and per email)
+AUTH_RATE_LIMIT_BACKEND = os.environ.get('AUTH_RATE_LIMIT_BACKEND', 'memory')
+AUTH_IP_BURST = int(os.environ.get('AUTH_IP_BURST', '20'))
+AUTH_IP_PER_MINUTE = float(os.environ.get('AUTH_IP_PER_MINUTE', '10'))
+AUTH_EMAIL_BURST = int(os.environ.get('AUTH_EMAIL_BURST', '5'))
+AUTH_EMAIL_PER_MINUTE = float(os.environ.get('AUTH_EMAIL_PER_MINUTE', '2'))
+AUTH_RATE_MAX_KEYS = int(os.environ.get('AUTH_RATE_MAX_KEYS', '100000'))
+AUTH_TRUST_FORWARDED_FOR = os.environ.get('AUTH_TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+
+# Fast JSON responses for list endpoints (skip response_model re-validation)
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', 'false').lower() == 'true'
+
+# Pagination
+PAGE_DEFAULT_LIMIT = int(os.environ.get('PAGE_DEFAULT_LIMIT', '100'))
+PAGE_MAX_LIMIT = int(os.environ.get('PAGE_MAX_LIMIT', '1000'))
+
+# Idempotency-Key support for order/reservation creation
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+IDEMPOTENCY_STALE_SECONDS = int(os.environ.get('IDEMPOTENCY_STALE_SECONDS', '60'))
+
+# Bulk admin imports
+BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', '20000'))
+
+# Visit slots and pricing
+VISIT_SLOT_HOURS = [h.strip() for h in os.environ.get('VISIT_SLOT_HOURS', '09:00,10:00,11:00,12:00,13:00,14:00,15:00,16:00').split(',') if h.strip()]
+VISIT_SLOT_CAPACITY = int(os.environ.get('VISIT_SLOT_CAPACITY', '50'))
+# Prices per type_visite in USD; types not listed use "default"
+VISIT_PRICING = json.loads(os.environ.get('VISIT_PRICING', '{"default": {"adulte": 10.0, "enfant": 5.0}}'))
+
+# Exports
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+
+# Availability calendar
+AVAILABILITY_CACHE_SECONDS = float(os.environ.get('AVAILABILITY_CACHE_SECONDS', '15'))
+AVAILABILITY_MAX_DAYS = int(os.environ.get('AVAILABILITY_MAX_DAYS', '92'))
+
+# Email templates
+EMAIL_TEMPLATES_DIR = ROOT_DIR / "templates" / "emails"
+
+# Email outbox
+EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT', '')
+EMAIL_WORKER_ENABLED = os.environ.get('EMAIL_WORKER_ENABLED', 'true').lower() == 'true'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', '20'))
+EMAIL_OUTBOX_CONCURRENCY = int(os.environ.get('EMAIL_OUTBOX_CONCURRENCY', '4'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', '5'))
+EMAIL_OUTBOX_LEASE_SECONDS = float(os.environ.get('EMAIL_OUTBOX_LEASE_SECONDS', '120'))
+EMAIL_OUTBOX_BACKOFF_SECONDS = float(os.environ.get('EMAIL_OUTBOX_BACKOFF_SECONDS', '30'))
+
+# Public catalog cache
+CATALOG_VERSION_CHECK_SECONDS = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', '2'))
+CATALOG_MAX_CACHED_PAGES = int(os.environ.get('CATALOG_MAX_CACHED_PAGES', '512'))
+CATALOG_STOCK_REFRESH_SECONDS = float(os.environ.get('CATALOG_STOCK_REFRESH_SECONDS', '30'))
+
+# Indexes
+ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
 # Upload directories
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(256 * 1024)))
+# Room for the multipart boundaries and part headers around the file
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+IMAGE_VARIANT_SIZES = {
+    "thumb": int(os.environ.get('IMAGE_THUMB_SIZE', '320')),
+    "medium": int(os.environ.get('IMAGE_MEDIUM_SIZE', '1024')),
+}
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '82'))
+IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', '80'))
+IMAGE_POOL_WORKERS = int(os.environ.get('IMAGE_POOL_WORKERS', '2'))
 UPLOADS_DIR = ROOT_DIR / "uploads"
 UPLOADS_DIR.mkdir(exist_ok=True)
 (UPLOADS_DIR / "produits").mkdir(exist_ok=True)
@@ -70,6 +391,10 @@ class CommandeStatus(str, Enum):
     RETIREE = "retiree"
     ANNULEE = "annulee"
 
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
 class CultureStatus(str, Enum):
     EN_PREPARATION = "en_preparation"
     EN_PRODUCTION = "en_production"
@@ -97,6 +422,13 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class PhotoVariants(BaseModel):
+    original: str
+    thumb_webp: str
+    thumb_jpeg: str
+    medium_webp: str
+    medium_jpeg: str
+
 class Produit(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -108,6 +440,7 @@ class Produit(BaseModel):
     stock: float
     saison: bool = False
     photos: List[str] = []
+    photo_variants: List[PhotoVariants] = []
     visible: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -121,6 +454,23 @@ class ProduitCreate(BaseModel):
     saison: bool = False
     visible: bool = True
 
+class ProduitUpdate(BaseModel):
+    nom: Optional[str] = None
+    categorie: Optional[str] = None
+    description: Optional[str] = None
+    prix: Optional[float] = None
+    unite: Optional[str] = None
+    stock: Optional[float] = None
+    saison: Optional[bool] = None
+    visible: Optional[bool] = None
+
+class ProduitBulkUpdate(BaseModel):
+    id: str
+    stock: Optional[float] = None
+    ajout_stock: Optional[float] = None
+    prix: Optional[float] = None
+    visible: Optional[bool] = None
+
 class Animal(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -129,6 +479,7 @@ class Animal(BaseModel):
     enclos: str
     etat_sante: str = "Bonne santé"
     photo: str = ""
+    photo_variants: Optional[PhotoVariants] = None
     description: str = ""
     visible: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -141,6 +492,14 @@ class AnimalCreate(BaseModel):
     description: str = ""
     visible: bool = True
 
+class AnimalUpdate(BaseModel):
+    espece: Optional[str] = None
+    nom: Optional[str] = None
+    enclos: Optional[str] = None
+    etat_sante: Optional[str] = None
+    description: Optional[str] = None
+    visible: Optional[bool] = None
+
 class Culture(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -156,6 +515,12 @@ class CultureCreate(BaseModel):
     periode_production: str
     statut: CultureStatus = CultureStatus.EN_PRODUCTION
 
+class CultureUpdate(BaseModel):
+    type_culture: Optional[str] = None
+    surface: Optional[float] = None
+    periode_production: Optional[str] = None
+    statut: Optional[CultureStatus] = None
+
 class Reservation(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -176,8 +541,8 @@ class ReservationCreate(BaseModel):
     date_visite: str
     heure_visite: str
     type_visite: str
-    nb_adultes: int
-    nb_enfants: int
+    nb_adultes: int = Field(ge=0)
+    nb_enfants: int = Field(ge=0)
 
 class CommandeItem(BaseModel):
     produit_id: str
@@ -201,8 +566,12 @@ class Commande(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CommandeItemCreate(BaseModel):
+    produit_id: str
+    quantite: float = Field(gt=0)
+
 class CommandeCreate(BaseModel):
-    items: List[CommandeItem]
+    items: List[CommandeItemCreate] = Field(min_length=1)
     mode_retrait: str
     adresse_livraison: Optional[str] = ""
 
@@ -213,116 +582,597 @@ class ContactMessage(BaseModel):
     message: str
 
 # Email Service
+class EmailTemplate:
+    """A template file parsed once into literal chunks and field names.
+
+    Placeholders use str.format syntax. In HTML templates values are
+    escaped, except fields ending in "_html" which hold pre-rendered markup.
+    """
+    def __init__(self, path: Path, escape_html: bool):
+        source = path.read_text(encoding="utf-8")
+        self.parts = []
+        for literal, field, _, _ in string.Formatter().parse(source):
+            if field is None:
+                self.parts.append((literal, None, False))
+            else:
+                self.parts.append((literal, field, escape_html and not field.endswith("_html")))
+    
+    def render(self, values: dict) -> str:
+        out = []
+        for literal, field, escape in self.parts:
+            out.append(literal)
+            if field is not None:
+                value = str(values[field])
+                out.append(html.escape(value) if escape else value)
+        return "".join(out)
+
+def load_email_templates(directory: Path) -> dict:
+    templates = {}
+    for path in sorted(directory.glob("*.html")) + sorted(directory.glob("*.txt")):
+        templates[(path.stem, path.suffix[1:])] = EmailTemplate(path, escape_html=path.suffix == ".html")
+    return templates
+
+def _amount(value: float) -> str:
+    return f"{value:.2f}"
+
 class EmailService:
-    def __init__(self):
-        self.brevo_api_key = os.environ.get('BREVO_API_KEY', '')
-        if self.brevo_api_key:
-            configuration = sib_api_v3_sdk.Configuration()
-            configuration.api_key['api-key'] = self.brevo_api_key
-            self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-        else:
-            self.api_instance = None
+    """Builds transactional emails from templates loaded once at startup.
+
+    Delivery goes through the email outbox.
+    """
+    def __init__(self, templates_dir: Path):
+        self.sender = {"name": "Mikombo Park", "email": os.environ.get('SENDER_EMAIL', 'noreply@mikombopark.com')}
+        self.templates = load_email_templates(templates_dir)
     
-    def send_reservation_confirmation(self, reservation: Reservation):
-        if not self.api_instance:
-            logging.warning("Brevo API key not configured. Email not sent.")
-            return
+    def _render(self, name: str, values: dict) -> tuple:
+        return self.templates[(name, "html")].render(values), self.templates[(name, "txt")].render(values)
+    
+    def reservation_confirmation(self, reservation: Reservation) -> dict:
+        values = {
+            "user_name": reservation.user_name,
+            "id": reservation.id,
+            "date_visite": reservation.date_visite,
+            "heure_visite": reservation.heure_visite,
+            "type_visite": reservation.type_visite,
+            "nb_adultes": reservation.nb_adultes,
+            "nb_enfants": reservation.nb_enfants,
+            "prix_total": _amount(reservation.prix_total)
+        }
+        html_content, text_content = self._render("reservation_confirmation", values)
+        return {
+            "to": [{"email": reservation.user_email, "name": reservation.user_name}],
+            "sender": self.sender,
+            "subject": "Confirmation de réservation - Mikombo Park",
+            "html_content": html_content,
+            "text_content": text_content
+        }
+    
+    def commande_confirmation(self, commande: Commande) -> dict:
+        item_html = self.templates[("commande_item", "html")]
+        item_text = self.templates[("commande_item", "txt")]
+        items_html = []
+        items_text = []
+        for item in commande.items:
+            item_values = {
+                "nom": item.nom,
+                "quantite": item.quantite,
+                "unite": item.unite,
+                "prix": _amount(item.prix),
+                "sous_total": _amount(item.prix * item.quantite)
+            }
+            items_html.append(item_html.render(item_values))
+            items_text.append(item_text.render(item_values))
         
+        adresse_html = adresse_text = ""
+        if commande.adresse_livraison:
+            adresse_html, adresse_text = self._render("commande_adresse", {"adresse_livraison": commande.adresse_livraison})
+        
+        values = {
+            "user_name": commande.user_name,
+            "id": commande.id,
+            "items_html": "".join(items_html),
+            "items_text": "".join(items_text),
+            "total": _amount(commande.total),
+            "mode_retrait": commande.mode_retrait,
+            "adresse_html": adresse_html,
+            "adresse_text": adresse_text
+        }
+        html_content, text_content = self._render("commande_confirmation", values)
+        return {
+            "to": [{"email": commande.user_email, "name": commande.user_name}],
+            "sender": self.sender,
+            "subject": "Confirmation de commande - Mikombo Park",
+            "html_content": html_content,
+            "text_content": text_content
+        }
+    
+    def render(self, kind: str, data: dict) -> dict:
+        if kind == "reservation_confirmation":
+            return self.reservation_confirmation(Reservation(**data))
+        if kind == "commande_confirmation":
+            return self.commande_confirmation(Commande(**data))
+        raise ValueError(f"Unknown email kind: {kind}")
+
+email_service = EmailService(EMAIL_TEMPLATES_DIR)
+
+# Email transports
+class EmailDeliveryError(Exception):
+    pass
+
+class BrevoEmailTransport:
+    """Sends through the Brevo SDK on a dedicated thread pool.
+
+    The SDK is synchronous, so it gets its own small executor and never
+    takes slots from the request threadpool.
+    """
+    def __init__(self, api_key: str, max_workers: int):
+        configuration = sib_api_v3_sdk.Configuration()
+        configuration.api_key['api-key'] = api_key
+        self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="brevo")
+    
+    def _send_sync(self, message: dict):
         try:
-            sender = {"name": "Mikombo Park", "email": os.environ.get('SENDER_EMAIL', 'noreply@mikombopark.com')}
-            to = [{"email": reservation.user_email, "name": reservation.user_name}]
-            
-            html_content = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f4e8d8;">
-                        <h1 style="color: #6b5742; text-align: center;">Réservation Confirmée</h1>
-                        <div style="background-color: white; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                            <p>Bonjour {reservation.user_name},</p>
-                            <p>Votre réservation au <strong>Mikombo Park</strong> a été confirmée !</p>
-                            <h3 style="color: #8b9a7e;">Détails de votre réservation :</h3>
-                            <ul>
-                                <li><strong>Numéro :</strong> {reservation.id}</li>
-                                <li><strong>Date :</strong> {reservation.date_visite}</li>
-                                <li><strong>Heure :</strong> {reservation.heure_visite}</li>
-                                <li><strong>Type de visite :</strong> {reservation.type_visite}</li>
-                                <li><strong>Nombre d'adultes :</strong> {reservation.nb_adultes}</li>
-                                <li><strong>Nombre d'enfants :</strong> {reservation.nb_enfants}</li>
-                                <li><strong>Prix total :</strong> {reservation.prix_total} USD</li>
-                            </ul>
-                            <p style="color: #c17856;">Veuillez arriver au moins 15 minutes avant l'heure de votre visite.</p>
-                            <p>À bientôt au Mikombo Park !</p>
-                        </div>
-                    </div>
-                </body>
-            </html>
-            """
-            
-            send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-                to=to,
-                sender=sender,
-                subject=f"Confirmation de réservation - Mikombo Park",
-                html_content=html_content
-            )
-            
-            self.api_instance.send_transac_email(send_smtp_email)
-            logging.info(f"Reservation confirmation email sent to {reservation.user_email}")
+            self.api_instance.send_transac_email(sib_api_v3_sdk.SendSmtpEmail(**message))
         except ApiException as e:
-            logging.error(f"Error sending email: {e}")
+            raise EmailDeliveryError(f"Brevo error {e.status}: {e.reason}")
     
-    def send_commande_confirmation(self, commande: Commande):
-        if not self.api_instance:
-            logging.warning("Brevo API key not configured. Email not sent.")
-            return
+    async def send(self, message: dict):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._send_sync, message)
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+class LoggingEmailTransport:
+    """Used when no Brevo key is configured: logs and drops the message."""
+    async def send(self, message: dict):
+        logging.warning(f"Brevo API key not configured. Email to {message['to'][0]['email']} not sent.")
+    
+    def close(self):
+        pass
+
+class FakeEmailTransport:
+    """Local transport for development and tests; records sent messages.
+
+    fail_times makes the first N sends raise, to exercise retries.
+    """
+    def __init__(self, fail_times: int = 0, delay: float = 0.0):
+        self.sent = []
+        self.fail_times = fail_times
+        self.delay = delay
+    
+    async def send(self, message: dict):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise EmailDeliveryError("Fake transport failure")
+        self.sent.append(message)
+    
+    def close(self):
+        pass
+
+def build_email_transport():
+    kind = EMAIL_TRANSPORT or ("brevo" if os.environ.get('BREVO_API_KEY') else "log")
+    if kind == "brevo":
+        return BrevoEmailTransport(os.environ['BREVO_API_KEY'], EMAIL_OUTBOX_CONCURRENCY)
+    if kind == "fake":
+        return FakeEmailTransport()
+    return LoggingEmailTransport()
+
+# Email outbox
+class EmailOutbox:
+    """Durable queue of outgoing emails stored in the email_outbox collection.
+
+    Handlers enqueue() a job; the worker loop claims pending jobs in batches,
+    sends them with at most `concurrency` in flight and retries failures with
+    exponential backoff. Jobs left in "sending" by a crashed worker become
+    claimable again once their lease expires.
+    """
+    def __init__(self, transport, batch_size: int, concurrency: int, max_attempts: int,
+                 poll_seconds: float, lease_seconds: float, backoff_seconds: float):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.backoff_seconds = backoff_seconds
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+    
+    async def enqueue(self, kind: str, data: dict) -> str:
+        now = datetime.now(timezone.utc)
+        job_id = str(uuid.uuid4())
+        await db.email_outbox.insert_one({
+            "id": job_id,
+            "kind": kind,
+            "data": data,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "locked_until": None,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now
+        })
+        self._wakeup.set()
+        return job_id
+    
+    def _claimable(self, now: datetime) -> dict:
+        return {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_until": {"$lte": now}}
+        ]}
+    
+    async def _claim_batch(self) -> List[dict]:
+        now = datetime.now(timezone.utc)
+        candidates = await db.email_outbox.find(self._claimable(now), {"_id": 0, "id": 1}).sort("next_attempt_at", ASCENDING).limit(self.batch_size).to_list(self.batch_size)
+        if not candidates:
+            return []
         
-        try:
-            sender = {"name": "Mikombo Park", "email": os.environ.get('SENDER_EMAIL', 'noreply@mikombopark.com')}
-            to = [{"email": commande.user_email, "name": commande.user_name}]
-            
-            items_html = "".join([f"<li>{item.nom} - {item.quantite} {item.unite} x {item.prix} USD = {item.prix * item.quantite} USD</li>" for item in commande.items])
-            
-            html_content = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f4e8d8;">
-                        <h1 style="color: #6b5742; text-align: center;">Commande Confirmée</h1>
-                        <div style="background-color: white; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                            <p>Bonjour {commande.user_name},</p>
-                            <p>Merci pour votre commande de produits bio du <strong>Mikombo Park</strong> !</p>
-                            <h3 style="color: #8b9a7e;">Détails de votre commande :</h3>
-                            <p><strong>Numéro :</strong> {commande.id}</p>
-                            <ul>{items_html}</ul>
-                            <p style="font-size: 18px; font-weight: bold;"><strong>Total :</strong> {commande.total} USD</p>
-                            <p><strong>Mode de retrait :</strong> {commande.mode_retrait}</p>
-                            {f'<p><strong>Adresse de livraison :</strong> {commande.adresse_livraison}</p>' if commande.adresse_livraison else ''}
-                            <p style="color: #c17856;">Nous vous contacterons dès que votre commande sera prête.</p>
-                        </div>
-                    </div>
-                </body>
-            </html>
-            """
-            
-            send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-                to=to,
-                sender=sender,
-                subject=f"Confirmation de commande - Mikombo Park",
-                html_content=html_content
-            )
-            
-            self.api_instance.send_transac_email(send_smtp_email)
-            logging.info(f"Order confirmation email sent to {commande.user_email}")
-        except ApiException as e:
-            logging.error(f"Error sending email: {e}")
+        claim = str(uuid.uuid4())
+        await db.email_outbox.update_many(
+            {"$and": [{"id": {"$in": [c["id"] for c in candidates]}}, self._claimable(now)]},
+            {"$set": {"status": "sending", "claim": claim, "locked_until": now + timedelta(seconds=self.lease_seconds), "updated_at": now}}
+        )
+        return await db.email_outbox.find({"claim": claim}, {"_id": 0}).to_list(self.batch_size)
+    
+    async def _deliver(self, job: dict, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                message = email_service.render(job["kind"], job["data"])
+                await self.transport.send(message)
+                return None
+            except Exception as e:
+                return str(e) or e.__class__.__name__
+    
+    async def run_once(self) -> int:
+        """Claim and process one batch. Returns the number of jobs handled."""
+        jobs = await self._claim_batch()
+        if not jobs:
+            return 0
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        errors = await asyncio.gather(*(self._deliver(job, semaphore) for job in jobs))
+        
+        now = datetime.now(timezone.utc)
+        operations = []
+        for job, error in zip(jobs, errors):
+            attempts = job["attempts"] + 1
+            if error is None:
+                self.sent += 1
+                changes = {"status": "sent", "attempts": attempts, "sent_at": now, "last_error": None}
+            elif attempts >= self.max_attempts:
+                self.failed += 1
+                logging.error(f"Email {job['id']} ({job['kind']}) failed permanently: {error}")
+                changes = {"status": "failed", "attempts": attempts, "last_error": error}
+            else:
+                self.retried += 1
+                delay = min(self.backoff_seconds * (2 ** (attempts - 1)), 3600) * random.uniform(0.8, 1.2)
+                changes = {"status": "pending", "attempts": attempts, "last_error": error, "next_attempt_at": now + timedelta(seconds=delay)}
+            changes.update({"locked_until": None, "updated_at": now})
+            operations.append(UpdateOne({"id": job["id"], "claim": job["claim"]}, {"$set": changes, "$unset": {"claim": ""}}))
+        
+        await db.email_outbox.bulk_write(operations, ordered=False)
+        return len(jobs)
+    
+    async def run(self):
+        while True:
+            try:
+                handled = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Email outbox worker error: {e}")
+                handled = 0
+            if handled < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.transport.close()
+    
+    async def backlog(self) -> dict:
+        counts = {"pending": 0, "sending": 0, "sent": 0, "failed": 0}
+        async for row in db.email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        oldest = await db.email_outbox.find_one({"status": "pending"}, {"_id": 0, "created_at": 1}, sort=[("created_at", ASCENDING)])
+        oldest_age = None
+        if oldest:
+            created_at = oldest["created_at"]
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            oldest_age = round((datetime.now(timezone.utc) - created_at).total_seconds(), 1)
+        return {
+            **counts,
+            "oldest_pending_seconds": oldest_age,
+            "worker": {"running": self._task is not None, "sent": self.sent, "retried": self.retried, "failed": self.failed}
+        }
+
+email_outbox = EmailOutbox(
+    build_email_transport(),
+    batch_size=EMAIL_OUTBOX_BATCH_SIZE,
+    concurrency=EMAIL_OUTBOX_CONCURRENCY,
+    max_attempts=EMAIL_OUTBOX_MAX_ATTEMPTS,
+    poll_seconds=EMAIL_OUTBOX_POLL_SECONDS,
+    lease_seconds=EMAIL_OUTBOX_LEASE_SECONDS,
+    backoff_seconds=EMAIL_OUTBOX_BACKOFF_SECONDS
+)
+
+# Indexes
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "produits": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("visible", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="visible_created_at_id"),
+        IndexModel([("visible", ASCENDING), ("categorie", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="visible_categorie"),
+    ],
+    "animaux": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("visible", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="visible"),
+    ],
+    "cultures": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "reservations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="user_id_created_at"),
+        IndexModel([("date_visite", ASCENDING)], name="date_visite"),
+    ],
+    "commandes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="user_id_created_at"),
+    ],
+    "messages": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "visit_slots": [
+        IndexModel([("date_visite", ASCENDING), ("heure_visite", ASCENDING)], name="date_heure"),
+    ],
+    "stats_daily_produits": [
+        IndexModel([("day", ASCENDING), ("produit_id", ASCENDING)], name="day_produit_id"),
+    ],
+    "email_outbox": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("claim", ASCENDING)], name="claim", sparse=True),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "idempotency_keys": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    "profiles": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=PROFILE_TTL_SECONDS),
+    ],
+}
+
+def _index_matches(existing: dict, model: IndexModel) -> bool:
+    spec = model.document
+    return (
+        [tuple(k) for k in existing.get("key", [])] == list(spec["key"].items())
+        and bool(existing.get("unique", False)) == bool(spec.get("unique", False))
+        and existing.get("expireAfterSeconds") == spec.get("expireAfterSeconds")
+    )
 
-email_service = EmailService()
+async def ensure_indexes(database, rebuild: bool = True) -> List[dict]:
+    """Create missing indexes and rebuild those whose definition changed.
+
+    Returns one report entry per declared index with the action taken
+    ("exists", "created", "rebuilt", "mismatch" or "failed") and the build
+    time in seconds. With rebuild=False a changed index is only reported as
+    "mismatch"; dropping and rebuilding is left to create_indexes.py.
+    Each index is handled on its own, so one failure (e.g. duplicates
+    blocking a unique index) is reported with its "error" and the others
+    still get built. Indexes that exist in MongoDB but are not declared are
+    left untouched.
+    """
+    report = []
+    for collection_name, models in INDEXES.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        for model in models:
+            name = model.document["name"]
+            entry = {"collection": collection_name, "index": name, "action": "created", "seconds": 0.0}
+            report.append(entry)
+            if name in existing:
+                if _index_matches(existing[name], model):
+                    entry["action"] = "exists"
+                    continue
+                if not rebuild:
+                    entry["action"] = "mismatch"
+                    continue
+                entry["action"] = "rebuilt"
+            started = time.perf_counter()
+            try:
+                if entry["action"] == "rebuilt":
+                    await collection.drop_index(name)
+                await collection.create_indexes([model])
+            except PyMongoError as e:
+                entry["action"] = "failed"
+                entry["error"] = str(e)
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+    return report
 
 # Helper functions
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+class PasswordPool:
+    """Runs bcrypt work on a dedicated thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    When more than max_pending jobs are queued or running, new requests are
+    rejected immediately with a 503 instead of piling up.
+    """
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Serveur occupé, veuillez réessayer",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self.run(verify_password, password, hashed)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = PasswordPool(PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING)
+
+class AuthRateLimiter:
+    """Token buckets guarding login/register, keyed by client IP and by email.
+
+    Each attempt takes one token from both buckets; buckets refill
+    continuously up to their burst size. Checks happen before any user
+    lookup or bcrypt work, so a credential-stuffing burst costs almost
+    nothing. The "memory" backend is per process and bounded (LRU); the
+    "mongo" backend keeps buckets in the rate_limits collection so all
+    workers share them, at the cost of one atomic update per bucket.
+    Counters are always per process.
+    """
+    def __init__(self, backend: str, limits: dict, max_keys: int):
+        self.backend = backend
+        self.limits = limits
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = {name: 0 for name in limits}
+        self.rejected_by_route = {}
+
+    def _take_memory(self, key: str, burst: int, per_second: float) -> float:
+        """Take a token; return 0 on success or the seconds until one is available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(burst), now]
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * per_second)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / per_second
+
+    async def _take_mongo(self, key: str, burst: int, per_second: float) -> float:
+        now = datetime.now(timezone.utc)
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, per_second]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": now, "expires_at": now + timedelta(seconds=burst / per_second)}},
+            {"$set": {
+                "allowed": {"$gte": ["$tokens", 1]},
+                "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]}
+            }},
+        ]
+        try:
+            bucket = await db.rate_limits.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A concurrent first attempt created the bucket; update it instead
+            bucket = await db.rate_limits.find_one_and_update(
+                {"_id": key}, pipeline, return_document=ReturnDocument.AFTER
+            )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / per_second
+
+    async def check(self, request: Request, route: str, email: str):
+        """Raise 429 with Retry-After if the IP or the email is over its limit."""
+        ip = request.client.host if request.client else "unknown"
+        if AUTH_TRUST_FORWARDED_FOR and request.headers.get("x-forwarded-for"):
+            ip = request.headers["x-forwarded-for"].split(",")[0].strip()
+        keys = {"ip": f"ip:{ip}", "email": f"email:{email.strip().lower()}"}
+        for name, key in keys.items():
+            burst, per_minute = self.limits[name]
+            if self.backend == "mongo":
+                wait = await self._take_mongo(key, burst, per_minute / 60)
+            else:
+                wait = self._take_memory(key, burst, per_minute / 60)
+            if wait:
+                self.rejected[name] += 1
+                self.rejected_by_route[route] = self.rejected_by_route.get(route, 0) + 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Trop de tentatives, veuillez réessayer plus tard",
+                    headers={"Retry-After": str(max(1, int(wait + 0.999)))}
+                )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "allowed": self.allowed,
+            "rejected": dict(self.rejected),
+            "rejected_by_route": dict(self.rejected_by_route),
+            "tracked_keys": len(self._buckets),
+            "limits": {name: {"burst": burst, "per_minute": per_minute} for name, (burst, per_minute) in self.limits.items()},
+        }
+
+auth_limiter = AuthRateLimiter(
+    AUTH_RATE_LIMIT_BACKEND,
+    {"ip": (AUTH_IP_BURST, AUTH_IP_PER_MINUTE), "email": (AUTH_EMAIL_BURST, AUTH_EMAIL_PER_MINUTE)},
+    AUTH_RATE_MAX_KEYS
+)
+
 def create_token(user_id: str, role: str) -> str:
     payload = {
         "user_id": user_id,
@@ -340,10 +1190,196 @@ def verify_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token invalide")
 
+def encode_cursor(doc: dict) -> str:
+    created_at = doc.get('created_at')
+    if isinstance(created_at, datetime):
+        key = ["d", created_at.isoformat(), doc['id']]
+    else:
+        key = ["s", created_at, doc['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        kind, created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if kind == "d":
+            created_at = datetime.fromisoformat(created_at)
+        elif kind != "s":
+            raise ValueError(kind)
+        return created_at, str(doc_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+def model_projection(model) -> dict:
+    """Projection returning exactly the fields of a response model."""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+def keyset_condition(cursor: str, order: SortOrder) -> dict:
+    """Filter matching the documents after `cursor` in (created_at, id) order."""
+    created_at, doc_id = decode_cursor(cursor)
+    op = "$lt" if order == SortOrder.DESC else "$gt"
+    conditions = [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: doc_id}}
+    ]
+    if isinstance(created_at, str) and order == SortOrder.ASC:
+        conditions.append({"created_at": {"$type": "date"}})
+    elif isinstance(created_at, datetime) and order == SortOrder.DESC:
+        conditions.append({"created_at": {"$type": "string"}})
+    return {"$or": conditions}
+
+async def paginate(collection, query: dict, response: Response, limit: int, cursor: Optional[str], order: SortOrder, model=None) -> List[dict]:
+    """Keyset pagination on (created_at, id).
+
+    Returns at most `limit` documents and, when more remain, sets an opaque
+    X-Next-Cursor response header to pass back as `cursor` for the next page.
+    With a model, only that model's fields are fetched.
+
+    Until migrate_dates.py has run, created_at may still be an ISO string on
+    older documents. MongoDB sorts all strings before all dates and range
+    operators only match their own type, so the cursor condition also lets
+    through the other type that comes next in the sort order: pages stay
+    complete, but old and new documents are not interleaved chronologically
+    until the migration is done.
+    """
+    direction = DESCENDING if order == SortOrder.DESC else ASCENDING
+    if cursor:
+        query = {"$and": [query, keyset_condition(cursor, order)]}
+    
+    projection = model_projection(model) if model else {"_id": 0}
+    docs = await collection.find(query, projection).sort([("created_at", direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1])
+    return docs
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson (stdlib json when orjson is missing)."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+_model_defaults_cache = {}
+
+def _model_defaults(model) -> dict:
+    defaults = _model_defaults_cache.get(model)
+    if defaults is None:
+        defaults = {
+            name: field.default
+            for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+        _model_defaults_cache[model] = defaults
+    return defaults
+
+def list_response(model, docs: List[dict], response: Response):
+    """Return list documents through the trusted fast path when enabled.
+
+    Documents fetched with model_projection() and written by our own
+    handlers already have the model's shape, so FastAPI's re-validation
+    through response_model is skipped and they go straight to orjson.
+    Missing optional fields get the model defaults. When disabled, the
+    documents are returned for the regular validated path.
+    """
+    if not FAST_JSON_RESPONSES:
+        return docs
+    defaults = _model_defaults(model)
+    content = [{**defaults, **doc} for doc in docs] if defaults else docs
+    headers = {}
+    if "x-next-cursor" in response.headers:
+        headers["X-Next-Cursor"] = response.headers["x-next-cursor"]
+    return FastJSONResponse(content=content, headers=headers)
+
+async def update_document(collection, doc_id: str, update: dict, not_found: str) -> dict:
+    """Apply an update by id and return the new document in one round trip."""
+    doc = await collection.find_one_and_update(
+        {"id": doc_id},
+        update,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail=not_found)
+    return doc
+
+def update_fields(data: BaseModel) -> dict:
+    """Fields sent in a PATCH body; omitted or null fields are left untouched."""
+    changes = data.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Aucun champ à mettre à jour")
+    return changes
+
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 security = HTTPBearer(auto_error=False)
 
+class UserCache:
+    """Bounded LRU cache of resolved users, keyed by user id, with a TTL.
+
+    Call invalidate() whenever a user document is modified so the next
+    request reloads it from MongoDB.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def set(self, user: User):
+        if self.max_size <= 0:
+            return
+        self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
         raise HTTPException(status_code=401, detail="Non authentifié")
@@ -351,20 +1387,490 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token = credentials.credentials
     payload = verify_token(token)
     
-    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+    cached = user_cache.get(payload["user_id"])
+    if cached:
+        return cached
+    
+    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0, "password_hash": 0})
     if not user:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
     
-    return User(**user)
+    user = User(**user)
+    user_cache.set(user)
+    return user
 
 async def get_admin_user(user: User = Depends(get_current_user)):
     if user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Accès refusé")
     return user
 
+# Public catalog cache
+def _cursor_key(created_at, doc_id: str) -> tuple:
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (created_at, doc_id)
+
+class CatalogCache:
+    """In-memory snapshot of the visible public catalog, served as pre-serialized JSON.
+
+    Each collection snapshot is tagged with a version stamp kept in the
+    cache_versions collection. Admin writes bump the stamp through
+    invalidate(); other workers notice the new stamp within
+    CATALOG_VERSION_CHECK_SECONDS and rebuild their snapshot.
+
+    Orders only move stock, so they call invalidate_stock() instead, which
+    bumps a separate stamp. A snapshot is rebuilt for it at most once per
+    CATALOG_STOCK_REFRESH_SECONDS: catalog stock may lag by that much, the
+    order path itself always checks live stock.
+    """
+    def __init__(self, models: dict, check_interval: float, max_cached_pages: int, stock_refresh_interval: float):
+        self.models = models
+        self.check_interval = check_interval
+        self.max_cached_pages = max_cached_pages
+        self.stock_refresh_interval = stock_refresh_interval
+        self._snapshots = {}
+        self._checked_at = {}
+        self._locks = {name: asyncio.Lock() for name in models}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def _remote_version(self, name: str) -> tuple:
+        doc = await db.cache_versions.find_one({"_id": name}) or {}
+        return doc.get("version", 0), doc.get("stock_version", 0)
+
+    async def _load(self, name: str) -> dict:
+        version, stock_version = await self._remote_version(name)
+        docs = await db[name].find({"visible": True}, {"_id": 0}).sort([("created_at", ASCENDING), ("id", ASCENDING)]).to_list(None)
+        model = self.models[name]
+        # Re-sort on the normalized key: until migrate_dates.py has run, Mongo
+        # puts every string created_at before every date, which would break
+        # the bisect in _render_page
+        items = sorted((model(**doc) for doc in docs), key=lambda item: _cursor_key(item.created_at, item.id))
+        return {
+            "version": version, "stock_version": stock_version, "loaded_at": time.monotonic(),
+            "items": items, "views": {}, "pages": {}
+        }
+
+    def _is_stale(self, snapshot: dict, remote: tuple, now: float) -> bool:
+        version, stock_version = remote
+        if version != snapshot["version"]:
+            return True
+        return stock_version != snapshot["stock_version"] and now - snapshot["loaded_at"] >= self.stock_refresh_interval
+
+    async def _snapshot(self, name: str) -> dict:
+        snapshot = self._snapshots.get(name)
+        now = time.monotonic()
+        if snapshot and now - self._checked_at.get(name, 0) >= self.check_interval:
+            self._checked_at[name] = now
+            if self._is_stale(snapshot, await self._remote_version(name), now):
+                self._snapshots.pop(name, None)
+                snapshot = None
+        if snapshot:
+            return snapshot
+        
+        async with self._locks[name]:
+            snapshot = self._snapshots.get(name)
+            if not snapshot:
+                snapshot = await self._load(name)
+                self._snapshots[name] = snapshot
+                self._checked_at[name] = time.monotonic()
+            return snapshot
+
+    def _view(self, snapshot: dict, categorie: Optional[str]) -> tuple:
+        view = snapshot["views"].get(categorie)
+        if view is None:
+            items = snapshot["items"]
+            if categorie:
+                items = [item for item in items if getattr(item, "categorie", None) == categorie]
+            keys = [_cursor_key(item.created_at, item.id) for item in items]
+            view = (items, keys)
+            snapshot["views"][categorie] = view
+        return view
+
+    def _render_page(self, name: str, snapshot: dict, categorie: Optional[str], limit: int, cursor: Optional[str], order: SortOrder) -> tuple:
+        items, keys = self._view(snapshot, categorie)
+        if order == SortOrder.ASC:
+            start = bisect.bisect_right(keys, _cursor_key(*decode_cursor(cursor))) if cursor else 0
+            page = items[start:start + limit]
+            has_more = start + limit < len(items)
+        else:
+            end = bisect.bisect_left(keys, _cursor_key(*decode_cursor(cursor))) if cursor else len(items)
+            page = items[max(0, end - limit):end][::-1]
+            has_more = end > limit
+        
+        body = TypeAdapter(List[self.models[name]]).dump_json(page)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        next_cursor = encode_cursor(page[-1].model_dump()) if has_more and page else None
+        return body, etag, next_cursor
+
+    async def respond(self, request: Request, name: str, categorie: Optional[str], limit: int, cursor: Optional[str], order: SortOrder) -> Response:
+        snapshot = await self._snapshot(name)
+        page_key = (categorie, limit, cursor, order)
+        page = snapshot["pages"].get(page_key)
+        if page is None:
+            self.misses += 1
+            page = self._render_page(name, snapshot, categorie, limit, cursor, order)
+            if len(snapshot["pages"]) >= self.max_cached_pages:
+                snapshot["pages"].clear()
+            snapshot["pages"][page_key] = page
+        else:
+            self.hits += 1
+        
+        body, etag, next_cursor = page
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [tag.strip() for tag in if_none_match.split(",")]
+            if "*" in candidates or etag in candidates:
+                self.not_modified += 1
+                return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, name: str):
+        """Bump the shared version stamp and drop the local snapshot."""
+        await db.cache_versions.update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+        self._snapshots.pop(name, None)
+
+    async def invalidate_stock(self, name: str):
+        """Record a stock-only change; snapshots pick it up lazily (see class docstring)."""
+        await db.cache_versions.update_one({"_id": name}, {"$inc": {"stock_version": 1}}, upsert=True)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "snapshots": {
+                name: {"version": snapshot["version"], "stock_version": snapshot["stock_version"], "items": len(snapshot["items"]), "cached_pages": len(snapshot["pages"])}
+                for name, snapshot in self._snapshots.items()
+            }
+        }
+
+catalog_cache = CatalogCache(
+    {"produits": Produit, "animaux": Animal},
+    CATALOG_VERSION_CHECK_SECONDS,
+    CATALOG_MAX_CACHED_PAGES,
+    CATALOG_STOCK_REFRESH_SECONDS
+)
+
+# Dashboard counters
+STATS_COUNTERS_ID = "global"
+
+STATS_REBUILD_ATTEMPTS = 5
+
+async def bump_stats(changes: dict):
+    """Apply $inc deltas to the materialized dashboard counters document.
+
+    Every bump also increments `seq`, which rebuild_stats_counters() uses to
+    detect writes that happened while it was counting.
+    """
+    await db.stats_counters.update_one({"_id": STATS_COUNTERS_ID}, {"$inc": {**changes, "seq": 1}}, upsert=True)
+
+async def rebuild_stats_counters() -> dict:
+    """Recompute the dashboard counters from the collections.
+
+    Plain totals use estimated_document_count (collection metadata, no
+    scan); the per-statut order breakdown needs one aggregation. The result
+    is written with $set only if no bump_stats() landed in the meantime
+    (same `seq`), otherwise the counts are taken again, so concurrent $inc
+    are never overwritten. Only call it from the admin rebuild endpoint or
+    the maintenance scripts, never on a request path.
+    """
+    for _ in range(STATS_REBUILD_ATTEMPTS):
+        current = await db.stats_counters.find_one({"_id": STATS_COUNTERS_ID}, {"seq": 1})
+        seq = current.get("seq", 0) if current else None
+        counters = await _count_stats()
+        if current is None:
+            try:
+                await db.stats_counters.insert_one({"_id": STATS_COUNTERS_ID, "seq": 0, **counters})
+                return counters
+            except DuplicateKeyError:
+                continue
+        guard = {"_id": STATS_COUNTERS_ID, "seq": seq} if seq else {"_id": STATS_COUNTERS_ID, "seq": {"$in": [0, None]}}
+        result = await db.stats_counters.update_one(guard, {"$set": counters})
+        if result.matched_count:
+            return counters
+    raise HTTPException(status_code=409, detail="Compteurs modifiés pendant le recalcul, veuillez réessayer")
+
+async def _count_stats() -> dict:
+    produits, animaux, cultures, reservations, commandes, by_statut = await asyncio.gather(
+        db.produits.estimated_document_count(),
+        db.animaux.estimated_document_count(),
+        db.cultures.estimated_document_count(),
+        db.reservations.estimated_document_count(),
+        db.commandes.estimated_document_count(),
+        db.commandes.aggregate([{"$group": {"_id": "$statut", "count": {"$sum": 1}, "revenue": {"$sum": "$total"}}}]).to_list(None)
+    )
+    counters = {
+        "produits": produits,
+        "animaux": animaux,
+        "cultures": cultures,
+        "reservations": reservations,
+        "commandes": commandes,
+        "commandes_by_statut": {row["_id"]: row["count"] for row in by_statut},
+        "revenue_by_statut": {row["_id"]: row["revenue"] for row in by_statut},
+        "rebuilt_at": datetime.now(timezone.utc)
+    }
+    return counters
+
+# Analytics rollups
+def stats_key(value: str) -> str:
+    """Make a value safe to use as a MongoDB field name."""
+    return str(value).replace(".", "_").replace("$", "_") or "_"
+
+def _utc_day(value) -> str:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+async def rollup_commande(commande: dict, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) an order from the daily sales rollups."""
+    day = _utc_day(commande["created_at"])
+    await db.stats_daily.update_one(
+        {"_id": day},
+        {"$inc": {"commandes": sign, "revenue": sign * commande["total"]}},
+        upsert=True
+    )
+    await db.stats_daily_produits.bulk_write([
+        UpdateOne(
+            {"_id": f"{day}|{item['produit_id']}"},
+            {
+                "$inc": {"quantite": sign * item["quantite"], "revenue": sign * item["prix"] * item["quantite"]},
+                "$set": {"day": day, "produit_id": item["produit_id"], "nom": item["nom"], "unite": item["unite"]}
+            },
+            upsert=True
+        )
+        for item in commande["items"]
+    ], ordered=False)
+
+async def rollup_reservation(reservation: dict, sign: int = 1):
+    """Add or remove a reservation from the daily attendance rollups (by visit date)."""
+    type_visite = stats_key(reservation["type_visite"])
+    await db.stats_daily.update_one(
+        {"_id": reservation["date_visite"]},
+        {"$inc": {
+            "reservations": sign,
+            f"visiteurs.{type_visite}.adultes": sign * reservation["nb_adultes"],
+            f"visiteurs.{type_visite}.enfants": sign * reservation["nb_enfants"]
+        }},
+        upsert=True
+    )
+
+# Uploads
+def detect_image_type(head: bytes) -> Optional[str]:
+    """Return the file extension matching the image magic bytes, if allowed."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def upload_too_large() -> HTTPException:
+    if UPLOAD_MAX_BYTES >= 1024 * 1024:
+        limit = f"{UPLOAD_MAX_BYTES / (1024 * 1024):.1f} Mo"
+    else:
+        limit = f"{UPLOAD_MAX_BYTES / 1024:.0f} Ko"
+    return HTTPException(status_code=413, detail=f"Fichier trop volumineux (max {limit})")
+
+class UploadLimitMiddleware:
+    """Reject upload-photo requests whose body exceeds the upload limit.
+
+    FastAPI parses multipart bodies into temp files before the handler runs,
+    so the limit has to apply here: a declared Content-Length over the limit
+    gets a 413 before anything is read, and bodies without one (chunked) are
+    cut off as soon as the running total goes over.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.max_body = UPLOAD_MAX_BYTES + UPLOAD_MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith("/upload-photo"):
+            await self.app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body:
+            error = upload_too_large()
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    raise upload_too_large()
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+
+def _finalize_upload(tmp_path: Path, final_path: Path) -> bool:
+    """Move the upload into place; return False if the content was already stored."""
+    if final_path.exists():
+        # Same content already stored: keep the existing file, refreshing its
+        # mtime so gc_uploads.py's grace period covers the new reference
+        tmp_path.unlink()
+        os.utime(final_path)
+        return False
+    os.replace(tmp_path, final_path)
+    return True
+
+async def save_upload(file: UploadFile, subdir: str) -> tuple:
+    """Stream an uploaded image to uploads/<subdir>; return (url, created).
+
+    The body is read and written in UPLOAD_CHUNK_SIZE chunks with disk I/O
+    off the event loop. The type comes from the magic bytes, not the client
+    filename, and the file is named after its SHA-256 so identical uploads
+    share one file; `created` is False when that file already existed.
+
+    By the time this runs the multipart parser has already spooled the part,
+    so the UPLOAD_MAX_BYTES check here only keeps oversized files out of
+    uploads/. Bandwidth and the parser's temp files are protected earlier by
+    UploadLimitMiddleware.
+    """
+    directory = UPLOADS_DIR / subdir
+    tmp_path = directory / f".upload-{uuid.uuid4()}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    handle = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if extension is None:
+                extension = detect_image_type(chunk[:16])
+                if extension is None:
+                    raise HTTPException(status_code=415, detail="Format d'image non supporté (JPEG, PNG ou WebP)")
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise upload_too_large()
+            digest.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+        await asyncio.to_thread(handle.close)
+        if extension is None:
+            raise HTTPException(status_code=400, detail="Fichier vide")
+        
+        file_name = f"{digest.hexdigest()}.{extension}"
+        created = await asyncio.to_thread(_finalize_upload, tmp_path, directory / file_name)
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        await asyncio.to_thread(tmp_path.unlink, True)
+        raise
+    return f"/uploads/{subdir}/{file_name}", created
+
+def render_variants(source_path: str) -> dict:
+    """Write the resized WebP/JPEG variants of an image next to it.
+
+    Runs in a worker process. Variants are named <stem>_<size>.<ext>; since
+    originals are content-addressed, existing variants are reused as is.
+    Returns the variant file names keyed like the PhotoVariants fields.
+    """
+    from PIL import Image, ImageOps
+
+    source = Path(source_path)
+    targets = {}
+    for size_name in IMAGE_VARIANT_SIZES:
+        for fmt, ext in (("webp", "webp"), ("jpeg", "jpg")):
+            targets[(size_name, fmt)] = source.with_name(f"{source.stem}_{size_name}.{ext}")
+    missing = {key: path for key, path in targets.items() if not path.exists()}
+    if missing:
+        try:
+            with Image.open(source) as opened:
+                image = ImageOps.exif_transpose(opened)
+                image.load()
+        except Image.DecompressionBombError as e:
+            raise ValueError(str(e))
+        for size_name, max_side in IMAGE_VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            for (variant_size, fmt), path in missing.items():
+                if variant_size != size_name:
+                    continue
+                if fmt == "jpeg":
+                    output = resized
+                    if output.mode in ("RGBA", "LA", "P"):
+                        rgba = output.convert("RGBA")
+                        output = Image.new("RGB", rgba.size, (255, 255, 255))
+                        output.paste(rgba, mask=rgba.getchannel("A"))
+                    elif output.mode != "RGB":
+                        output = output.convert("RGB")
+                    options = {"quality": IMAGE_JPEG_QUALITY, "optimize": True, "progressive": True}
+                else:
+                    output = resized if resized.mode in ("RGB", "RGBA") else resized.convert("RGBA")
+                    options = {"quality": IMAGE_WEBP_QUALITY, "method": 4}
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                output.save(tmp_path, format=fmt.upper(), **options)
+                os.replace(tmp_path, path)
+    return {f"{size_name}_{fmt}": path.name for (size_name, fmt), path in targets.items()}
+
+class ImagePipeline:
+    """Generates photo variants on a process pool.
+
+    Resizing and encoding are CPU bound and hold the GIL, so they run in
+    separate processes. The pool is started on first use and replaced if a
+    worker dies (BrokenProcessPool), retrying the job once.
+
+    discard_unreadable removes the source when it cannot be decoded; only
+    pass it for a file the caller just created (save_upload's `created`),
+    since content-addressed files may be shared with other documents.
+    Everything else is left to gc_uploads.py.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+
+    async def _render(self, source: Path) -> dict:
+        for attempt in range(2):
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, render_variants, str(source))
+            except BrokenProcessPool:
+                logger.warning("Image worker pool broken, restarting it")
+                # Concurrent callers may have replaced it already
+                if self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+                if attempt:
+                    raise HTTPException(status_code=503, detail="Traitement d'image indisponible, veuillez réessayer")
+
+    async def variants(self, photo_url: str, discard_unreadable: bool = False) -> PhotoVariants:
+        source = ROOT_DIR / photo_url.lstrip("/")
+        try:
+            names = await self._render(source)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Image variants failed for {photo_url}: {e}")
+            if discard_unreadable:
+                await asyncio.to_thread(source.unlink, True)
+            raise HTTPException(status_code=400, detail="Image illisible")
+        prefix = photo_url.rsplit("/", 1)[0]
+        return PhotoVariants(original=photo_url, **{key: f"{prefix}/{name}" for key, name in names.items()})
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+image_pipeline = ImagePipeline(IMAGE_POOL_WORKERS)
+
 # Auth Routes
 @api_router.post("/auth/register")
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, request: Request):
+    await auth_limiter.check(request, "register", user_data.email)
     existing = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if existing:
         raise HTTPException(status_code=400, detail="Email déjà utilisé")
@@ -378,23 +1884,36 @@ async def register(user_data: UserCreate):
     )
     
     doc = user.model_dump()
-    doc['password_hash'] = hash_password(user_data.password)
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc['password_hash'] = await password_pool.hash(user_data.password)
     
-    await db.users.insert_one(doc)
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        # A concurrent registration for the same email won (email_unique)
+        raise HTTPException(status_code=400, detail="Email déjà utilisé")
     
     token = create_token(user.id, user.role)
     return {"user": user, "token": token}
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, request: Request):
+    await auth_limiter.check(request, "login", credentials.email)
     user_doc = await db.users.find_one({"email": credentials.email}, {"_id": 0})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
-    if not verify_password(credentials.password, user_doc['password_hash']):
+    if not await password_pool.verify(credentials.password, user_doc['password_hash']):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     
+    # Opportunistically upgrade hashes created with a different cost factor
+    if password_needs_rehash(user_doc['password_hash']):
+        try:
+            new_hash = await password_pool.hash(credentials.password)
+            await db.users.update_one({"id": user_doc['id']}, {"$set": {"password_hash": new_hash}})
+            user_cache.invalidate(user_doc['id'])
+        except HTTPException:
+            logger.info(f"Password pool busy, skipping rehash for user {user_doc['id']}")
+    
     user = User(**{k: v for k, v in user_doc.items() if k != 'password_hash'})
     token = create_token(user.id, user.role)
     return {"user": user, "token": token}
@@ -405,48 +1924,223 @@ async def get_me(user: User = Depends(get_current_user)):
 
 # Public Routes
 @api_router.get("/produits", response_model=List[Produit])
-async def get_produits(categorie: Optional[str] = None):
-    query = {"visible": True}
-    if categorie:
-        query["categorie"] = categorie
-    
-    produits = await db.produits.find(query, {"_id": 0}).to_list(1000)
-    for p in produits:
-        if isinstance(p.get('created_at'), str):
-            p['created_at'] = datetime.fromisoformat(p['created_at'])
-    return produits
+async def get_produits(request: Request, categorie: Optional[str] = None, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.ASC):
+    return await catalog_cache.respond(request, "produits", categorie, limit, cursor, order)
 
 @api_router.get("/produits/{produit_id}", response_model=Produit)
 async def get_produit(produit_id: str):
     produit = await db.produits.find_one({"id": produit_id}, {"_id": 0})
     if not produit:
         raise HTTPException(status_code=404, detail="Produit non trouvé")
-    if isinstance(produit.get('created_at'), str):
-        produit['created_at'] = datetime.fromisoformat(produit['created_at'])
     return Produit(**produit)
 
 @api_router.get("/animaux", response_model=List[Animal])
-async def get_animaux():
-    animaux = await db.animaux.find({"visible": True}, {"_id": 0}).to_list(1000)
-    for a in animaux:
-        if isinstance(a.get('created_at'), str):
-            a['created_at'] = datetime.fromisoformat(a['created_at'])
-    return animaux
+async def get_animaux(request: Request, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.ASC):
+    return await catalog_cache.respond(request, "animaux", None, limit, cursor, order)
 
 @api_router.post("/contact")
 async def contact(message: ContactMessage):
     doc = message.model_dump()
-    doc['created_at'] = datetime.now(timezone.utc).isoformat()
+    doc['created_at'] = datetime.now(timezone.utc)
     await db.messages.insert_one(doc)
     return {"success": True, "message": "Message envoyé avec succès"}
 
+# Visit slots
+def slot_key(date_visite: str, heure_visite: str) -> str:
+    return f"{date_visite}|{heure_visite}"
+
+def validate_slot(date_visite: str, heure_visite: str):
+    try:
+        day = datetime.strptime(date_visite, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date de visite invalide (AAAA-MM-JJ)")
+    if day < datetime.now(timezone.utc).date():
+        raise HTTPException(status_code=400, detail="La date de visite est passée")
+    if heure_visite not in VISIT_SLOT_HOURS:
+        raise HTTPException(status_code=400, detail=f"Heure de visite invalide, créneaux : {', '.join(VISIT_SLOT_HOURS)}")
+
+def visit_price(type_visite: str, nb_adultes: int, nb_enfants: int) -> float:
+    tarif = VISIT_PRICING.get(type_visite) or VISIT_PRICING["default"]
+    return round(nb_adultes * tarif["adulte"] + nb_enfants * tarif["enfant"], 2)
+
+async def reserve_slot(date_visite: str, heure_visite: str, visitors: int) -> bool:
+    """Atomically add visitors to a slot counter if it stays within capacity.
+
+    One conditional upsert on the visit_slots document; a slot may carry its
+    own "capacity", otherwise VISIT_SLOT_CAPACITY applies.
+    """
+    if visitors > VISIT_SLOT_CAPACITY:
+        existing = await db.visit_slots.find_one({"_id": slot_key(date_visite, heure_visite)}, {"capacity": 1})
+        if not existing or existing.get("capacity", VISIT_SLOT_CAPACITY) < visitors:
+            return False
+    guard = {
+        "_id": slot_key(date_visite, heure_visite),
+        "$expr": {"$lte": [{"$add": [{"$ifNull": ["$booked", 0]}, visitors]}, {"$ifNull": ["$capacity", VISIT_SLOT_CAPACITY]}]}
+    }
+    update = {
+        "$inc": {"booked": visitors, "reservations": 1},
+        "$setOnInsert": {"date_visite": date_visite, "heure_visite": heure_visite}
+    }
+    try:
+        await db.visit_slots.update_one(guard, update, upsert=True)
+    except DuplicateKeyError:
+        # The slot document exists: either it is full or a concurrent
+        # booking created it first, so retry once without upserting
+        result = await db.visit_slots.update_one(guard, update)
+        if result.modified_count != 1:
+            return False
+    await _update_visit_day(date_visite, visitors, 1)
+    return True
+
+async def release_slot(date_visite: str, heure_visite: str, visitors: int):
+    await db.visit_slots.update_one(
+        {"_id": slot_key(date_visite, heure_visite)},
+        {"$inc": {"booked": -visitors, "reservations": -1}}
+    )
+    await _update_visit_day(date_visite, -visitors, -1)
+
+async def _update_visit_day(date_visite: str, visitors: int, reservations: int):
+    """Maintain the per-day totals in visit_days and drop cached calendars."""
+    await db.visit_days.update_one(
+        {"_id": date_visite},
+        {"$inc": {"booked": visitors, "reservations": reservations}},
+        upsert=True
+    )
+    _availability_cache.clear()
+
+# Availability calendar
+_availability_cache = {}
+
+def _slot_availability(heure_visite: str, slot: dict) -> dict:
+    capacity = slot.get("capacity", VISIT_SLOT_CAPACITY)
+    booked = slot.get("booked", 0)
+    return {
+        "heure_visite": heure_visite,
+        "capacite": capacity,
+        "reserves": booked,
+        "disponibles": max(capacity - booked, 0),
+        "complet": booked >= capacity
+    }
+
+async def compute_availability(first_day, last_day, details: bool) -> List[dict]:
+    """Build the calendar from the visit_days / visit_slots counters.
+
+    Reads one counter document per day (and per slot with details), never
+    the reservations themselves. Without details only the slots carrying a
+    capacity override are read, so both views report the same day capacity.
+    """
+    days = [(first_day + timedelta(days=i)).isoformat() for i in range((last_day - first_day).days + 1)]
+    day_docs = {d["_id"]: d async for d in db.visit_days.find({"_id": {"$gte": days[0], "$lte": days[-1]}})}
+    slot_query = {"date_visite": {"$gte": days[0], "$lte": days[-1]}}
+    if details:
+        projection = {"_id": 0}
+    else:
+        slot_query["capacity"] = {"$exists": True}
+        projection = {"_id": 0, "date_visite": 1, "heure_visite": 1, "capacity": 1}
+    slot_docs = {}
+    async for slot in db.visit_slots.find(slot_query, projection):
+        slot_docs[(slot["date_visite"], slot["heure_visite"])] = slot
+    
+    today = datetime.now(timezone.utc).date().isoformat()
+    calendar = []
+    for day in days:
+        booked = day_docs.get(day, {}).get("booked", 0)
+        entry = {"date_visite": day, "reserves": booked, "ouvert": day >= today}
+        if details:
+            entry["creneaux"] = [_slot_availability(heure, slot_docs.get((day, heure), {})) for heure in VISIT_SLOT_HOURS]
+            capacity = sum(slot["capacite"] for slot in entry["creneaux"])
+        else:
+            capacity = sum(slot_docs.get((day, heure), {}).get("capacity", VISIT_SLOT_CAPACITY) for heure in VISIT_SLOT_HOURS)
+        entry["capacite"] = capacity
+        entry["disponibles"] = max(capacity - booked, 0) if entry["ouvert"] else 0
+        calendar.append(entry)
+    return calendar
+
+# Idempotency keys
+async def _claim_idempotency_key(key_id: str, request_hash: str) -> Optional[dict]:
+    """Take ownership of a key, or return the stored record of a finished request.
+
+    The first request inserts a pending record; the unique _id makes any
+    concurrent duplicate fail that insert and wait for the owner's result.
+    A pending record older than IDEMPOTENCY_STALE_SECONDS (owner crashed) is
+    taken over.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.02
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": key_id, "request_hash": request_hash, "status": "pending",
+                "created_at": now, "started_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        record = await db.idempotency_keys.find_one({"_id": key_id})
+        if record is None:
+            continue
+        if record["request_hash"] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key déjà utilisée pour une autre requête")
+        if record["status"] == "done":
+            return record
+        taken_over = await db.idempotency_keys.find_one_and_update(
+            {"_id": key_id, "status": "pending", "started_at": {"$lte": now - timedelta(seconds=IDEMPOTENCY_STALE_SECONDS)}},
+            {"$set": {"started_at": now}}
+        )
+        if taken_over:
+            return None
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="Requête identique en cours de traitement", headers={"Retry-After": "1"})
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+async def run_idempotent(scope: str, user: User, key: Optional[str], payload: BaseModel, response: Response, handler):
+    """Run handler() at most once per (user, scope, Idempotency-Key).
+
+    Without a key the handler simply runs. A retry with the same key and body
+    gets the stored response (flagged with Idempotent-Replayed) instead of
+    creating a second document; the same key with a different body is a 422.
+    Failed attempts release the key so the client can retry.
+    """
+    if not key:
+        return await handler()
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key trop longue")
+    key_id = f"{scope}:{user.id}:{key}"
+    request_hash = hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+    record = await _claim_idempotency_key(key_id, request_hash)
+    if record is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return record["response"]
+    try:
+        result = await handler()
+    except BaseException:
+        await db.idempotency_keys.delete_one({"_id": key_id, "status": "pending"})
+        raise
+    await db.idempotency_keys.update_one(
+        {"_id": key_id},
+        {"$set": {"status": "done", "response": result.model_dump(mode="json")}}
+    )
+    return result
+
 # Client Routes
 @api_router.post("/reservations", response_model=Reservation)
-async def create_reservation(reservation_data: ReservationCreate, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
-        # Calculate prix
-    prix_adulte = 10.0
-    prix_enfant = 5.0
-    prix_total = (reservation_data.nb_adultes * prix_adulte) + (reservation_data.nb_enfants * prix_enfant)
+async def create_reservation(
+    reservation_data: ReservationCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user: User = Depends(get_current_user)
+):
+    return await run_idempotent("reservations", user, idempotency_key, reservation_data, response, lambda: place_reservation(reservation_data, user))
+
+async def place_reservation(reservation_data: ReservationCreate, user: User) -> Reservation:
+    visitors = reservation_data.nb_adultes + reservation_data.nb_enfants
+    if visitors == 0:
+        raise HTTPException(status_code=400, detail="Au moins un visiteur est requis")
+    validate_slot(reservation_data.date_visite, reservation_data.heure_visite)
+    
+    prix_total = visit_price(reservation_data.type_visite, reservation_data.nb_adultes, reservation_data.nb_enfants)
     
     reservation = Reservation(
         user_id=user.id,
@@ -462,89 +2156,217 @@ async def create_reservation(reservation_data: ReservationCreate, background_tas
         statut=ReservationStatus.CONFIRMEE
     )
     
+    if not await reserve_slot(reservation.date_visite, reservation.heure_visite, visitors):
+        raise HTTPException(status_code=409, detail="Ce créneau est complet")
+    
     doc = reservation.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.reservations.insert_one(doc)
+    try:
+        await db.reservations.insert_one(doc)
+    except Exception:
+        await release_slot(reservation.date_visite, reservation.heure_visite, visitors)
+        raise
+    await bump_stats({"reservations": 1})
+    await rollup_reservation(doc)
     
-    # Send email in background
-    background_tasks.add_task(email_service.send_reservation_confirmation, reservation)
+    # Queue confirmation email
+    await email_outbox.enqueue("reservation_confirmation", reservation.model_dump(mode="json"))
     
     return reservation
 
+@api_router.get("/reservations/disponibilites")
+async def get_disponibilites(
+    response: Response,
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    details: bool = True
+):
+    try:
+        first_day = datetime.strptime(date_from, "%Y-%m-%d").date()
+        last_day = datetime.strptime(date_to, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates invalides (AAAA-MM-JJ)")
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="La date de fin précède la date de début")
+    if (last_day - first_day).days >= AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Période limitée à {AVAILABILITY_MAX_DAYS} jours")
+    
+    key = (first_day, last_day, details)
+    cached = _availability_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        calendar = cached[1]
+    else:
+        calendar = await compute_availability(first_day, last_day, details)
+        if len(_availability_cache) >= 256:
+            _availability_cache.clear()
+        _availability_cache[key] = (now + AVAILABILITY_CACHE_SECONDS, calendar)
+    
+    response.headers["Cache-Control"] = f"public, max-age={int(AVAILABILITY_CACHE_SECONDS)}"
+    return calendar
+
 @api_router.get("/reservations/mes-reservations", response_model=List[Reservation])
-async def get_my_reservations(user: User = Depends(get_current_user)):
-    reservations = await db.reservations.find({"user_id": user.id}, {"_id": 0}).to_list(1000)
-    for r in reservations:
-        if isinstance(r.get('created_at'), str):
-            r['created_at'] = datetime.fromisoformat(r['created_at'])
-    return reservations
+async def get_my_reservations(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_current_user)):
+    reservations = await paginate(db.reservations, {"user_id": user.id}, response, limit, cursor, order, Reservation)
+    return list_response(Reservation, reservations, response)
+
+# Stock
+async def reserve_stock(commande_id: str, quantities: dict) -> bool:
+    """Decrement stock for every product of an order in one bulk_write.
+
+    Each decrement only applies while enough stock remains and records a
+    hold (order id, quantity, time) in the product's stock_holds. If any
+    item cannot be reserved, the held products are restocked and False is
+    returned. On success the caller must confirm_stock() or release_stock();
+    holds left behind by a crash are undone by release_stale_stock_holds().
+    """
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            {"id": produit_id, "stock": {"$gte": quantite}, "stock_holds.commande_id": {"$ne": commande_id}},
+            {"$inc": {"stock": -quantite}, "$push": {"stock_holds": {"commande_id": commande_id, "quantite": quantite, "at": now}}}
+        )
+        for produit_id, quantite in quantities.items()
+    ]
+    result = await db.produits.bulk_write(operations, ordered=False)
+    if result.modified_count == len(operations):
+        return True
+    
+    await release_stock(commande_id, quantities)
+    return False
+
+async def confirm_stock(commande_id: str, quantities: dict):
+    await db.produits.update_many({"id": {"$in": list(quantities)}}, {"$pull": {"stock_holds": {"commande_id": commande_id}}})
+
+async def release_stock(commande_id: str, quantities: dict):
+    """Undo the decrements made by reserve_stock for this order only."""
+    await db.produits.bulk_write([
+        UpdateOne(
+            {"id": produit_id, "stock_holds.commande_id": commande_id},
+            {"$inc": {"stock": quantite}, "$pull": {"stock_holds": {"commande_id": commande_id}}}
+        )
+        for produit_id, quantite in quantities.items()
+    ], ordered=False)
+
+async def release_stale_stock_holds(max_age: timedelta) -> dict:
+    """Settle holds older than max_age whose request never finished.
+
+    A hold whose order was stored only missed confirm_stock() and is just
+    dropped; one without an order is restocked. Each settlement is a single
+    conditional update on the hold, so it cannot race release_stock().
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+    stale = []
+    async for produit in db.produits.find({"stock_holds.at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "stock_holds": 1}):
+        stale.extend((produit["id"], hold) for hold in produit["stock_holds"] if hold["at"].replace(tzinfo=timezone.utc) < cutoff)
+    
+    commande_ids = list({hold["commande_id"] for _, hold in stale})
+    stored = {doc["id"] async for doc in db.commandes.find({"id": {"$in": commande_ids}}, {"_id": 0, "id": 1})}
+    report = {"restocked": 0, "confirmed": 0}
+    for produit_id, hold in stale:
+        guard = {"id": produit_id, "stock_holds.commande_id": hold["commande_id"]}
+        pull = {"$pull": {"stock_holds": {"commande_id": hold["commande_id"]}}}
+        if hold["commande_id"] in stored:
+            result = await db.produits.update_one(guard, pull)
+            report["confirmed"] += result.modified_count
+        else:
+            result = await db.produits.update_one(guard, {**pull, "$inc": {"stock": hold["quantite"]}})
+            report["restocked"] += result.modified_count
+    if report["restocked"]:
+        await catalog_cache.invalidate_stock("produits")
+    return report
 
 @api_router.post("/commandes", response_model=Commande)
-async def create_commande(commande_data: CommandeCreate, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
-    # Calculate total
-    total = sum(item.prix * item.quantite for item in commande_data.items)
+async def create_commande(
+    commande_data: CommandeCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user: User = Depends(get_current_user)
+):
+    return await run_idempotent("commandes", user, idempotency_key, commande_data, response, lambda: place_commande(commande_data, user))
+
+async def place_commande(commande_data: CommandeCreate, user: User) -> Commande:
+    quantities = {}
+    for item in commande_data.items:
+        quantities[item.produit_id] = quantities.get(item.produit_id, 0) + item.quantite
+    
+    # Price from the catalog, never from the client
+    produits = await db.produits.find(
+        {"id": {"$in": list(quantities)}, "visible": True},
+        {"_id": 0, "id": 1, "nom": 1, "prix": 1, "unite": 1, "stock": 1}
+    ).to_list(len(quantities))
+    produits = {p["id"]: p for p in produits}
+    missing = [produit_id for produit_id in quantities if produit_id not in produits]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Produit non trouvé : {', '.join(missing)}")
+    
+    items = [
+        CommandeItem(produit_id=produit_id, nom=produits[produit_id]["nom"], prix=produits[produit_id]["prix"], quantite=quantite, unite=produits[produit_id]["unite"])
+        for produit_id, quantite in quantities.items()
+    ]
+    total = round(sum(item.prix * item.quantite for item in items), 2)
     
     commande = Commande(
         user_id=user.id,
         user_name=f"{user.prenom} {user.nom}",
         user_email=user.email,
         user_telephone=user.telephone,
-        items=commande_data.items,
+        items=items,
         mode_retrait=commande_data.mode_retrait,
         adresse_livraison=commande_data.adresse_livraison,
         statut=CommandeStatus.CONFIRMEE,
         total=total
     )
     
+    if not await reserve_stock(commande.id, quantities):
+        short = [produits[produit_id]["nom"] for produit_id, quantite in quantities.items() if produits[produit_id]["stock"] < quantite]
+        raise HTTPException(status_code=409, detail=f"Stock insuffisant : {', '.join(short)}" if short else "Stock insuffisant")
+    
     doc = commande.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
-    await db.commandes.insert_one(doc)
+    try:
+        await db.commandes.insert_one(doc)
+    except Exception:
+        await release_stock(commande.id, quantities)
+        raise
+    await confirm_stock(commande.id, quantities)
+    await bump_stats({"commandes": 1, f"commandes_by_statut.{commande.statut.value}": 1, f"revenue_by_statut.{commande.statut.value}": commande.total})
+    await rollup_commande(doc)
+    await catalog_cache.invalidate_stock("produits")
     
-    # Send email in background
-    background_tasks.add_task(email_service.send_commande_confirmation, commande)
+    # Queue confirmation email
+    await email_outbox.enqueue("commande_confirmation", commande.model_dump(mode="json"))
     
     return commande
 
 @api_router.get("/commandes/mes-commandes", response_model=List[Commande])
-async def get_my_commandes(user: User = Depends(get_current_user)):
-    commandes = await db.commandes.find({"user_id": user.id}, {"_id": 0}).to_list(1000)
-    for c in commandes:
-        if isinstance(c.get('created_at'), str):
-            c['created_at'] = datetime.fromisoformat(c['created_at'])
-        if isinstance(c.get('updated_at'), str):
-            c['updated_at'] = datetime.fromisoformat(c['updated_at'])
-    return commandes
+async def get_my_commandes(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_current_user)):
+    commandes = await paginate(db.commandes, {"user_id": user.id}, response, limit, cursor, order, Commande)
+    return list_response(Commande, commandes, response)
 
 # Admin Routes - Produits
 @api_router.get("/admin/produits", response_model=List[Produit])
-async def admin_get_produits(authorization: str = None):
-    produits = await db.produits.find({}, {"_id": 0}).to_list(1000)
-    for p in produits:
-        if isinstance(p.get('created_at'), str):
-            p['created_at'] = datetime.fromisoformat(p['created_at'])
-    return produits
+async def admin_get_produits(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_admin_user)):
+    produits = await paginate(db.produits, {}, response, limit, cursor, order, Produit)
+    return list_response(Produit, produits, response)
 
 @api_router.post("/admin/produits", response_model=Produit)
 async def admin_create_produit(produit_data: ProduitCreate, user: User = Depends(get_admin_user)):
     produit = Produit(**produit_data.model_dump())
     doc = produit.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.produits.insert_one(doc)
+    await bump_stats({"produits": 1})
+    await catalog_cache.invalidate("produits")
     return produit
 
 @api_router.put("/admin/produits/{produit_id}", response_model=Produit)
 async def admin_update_produit(produit_id: str, produit_data: ProduitCreate, user: User = Depends(get_admin_user)):
-    existing = await db.produits.find_one({"id": produit_id}, {"_id": 0})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Produit non trouvé")
-    
-    updated_data = produit_data.model_dump()
-    await db.produits.update_one({"id": produit_id}, {"$set": updated_data})
-    
-    updated_produit = await db.produits.find_one({"id": produit_id}, {"_id": 0})
-    if isinstance(updated_produit.get('created_at'), str):
-        updated_produit['created_at'] = datetime.fromisoformat(updated_produit['created_at'])
+    updated_produit = await update_document(db.produits, produit_id, {"$set": produit_data.model_dump()}, "Produit non trouvé")
+    await catalog_cache.invalidate("produits")
+    return Produit(**updated_produit)
+
+@api_router.patch("/admin/produits/{produit_id}", response_model=Produit)
+async def admin_patch_produit(produit_id: str, produit_data: ProduitUpdate, user: User = Depends(get_admin_user)):
+    updated_produit = await update_document(db.produits, produit_id, {"$set": update_fields(produit_data)}, "Produit non trouvé")
+    await catalog_cache.invalidate("produits")
     return Produit(**updated_produit)
 
 @api_router.delete("/admin/produits/{produit_id}")
@@ -552,58 +2374,163 @@ async def admin_delete_produit(produit_id: str, user: User = Depends(get_admin_u
     result = await db.produits.delete_one({"id": produit_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Produit non trouvé")
+    await bump_stats({"produits": -1})
+    await catalog_cache.invalidate("produits")
     return {"success": True}
 
 @api_router.post("/admin/produits/{produit_id}/upload-photo")
 async def upload_produit_photo(produit_id: str, file: UploadFile = File(...), user: User = Depends(get_admin_user)):
-    produit = await db.produits.find_one({"id": produit_id}, {"_id": 0})
-    if not produit:
+    if not await db.produits.count_documents({"id": produit_id}, limit=1):
         raise HTTPException(status_code=404, detail="Produit non trouvé")
     
-    file_ext = file.filename.split('.')[-1]
-    file_name = f"{uuid.uuid4()}.{file_ext}"
-    file_path = UPLOADS_DIR / "produits" / file_name
+    photo_url, created = await save_upload(file, "produits")
+    variants = await image_pipeline.variants(photo_url, discard_unreadable=created)
+    # Variants are derived from the content hash, so re-uploading the same
+    # image yields an identical entry and $addToSet keeps both lists unique
+    result = await db.produits.update_one(
+        {"id": produit_id},
+        {"$addToSet": {"photos": photo_url, "photo_variants": variants.model_dump()}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Produit non trouvé")
+    await catalog_cache.invalidate("produits")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    return {"photo_url": photo_url, "variants": variants}
+
+async def read_bulk_rows(request: Request) -> List[dict]:
+    """Parse a bulk body sent as a CSV file (with header) or a JSON array.
+
+    Empty CSV cells are dropped so they behave like omitted JSON fields.
+    """
+    body = await request.body()
+    if "csv" in request.headers.get("content-type", ""):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            rows = [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()} for row in reader]
+        except (UnicodeDecodeError, csv.Error):
+            raise HTTPException(status_code=400, detail="CSV invalide")
+    else:
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON invalide")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise HTTPException(status_code=400, detail="Un tableau JSON d'objets est attendu")
+    if not rows:
+        raise HTTPException(status_code=400, detail="Aucune ligne à importer")
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Trop de lignes (max {BULK_MAX_ROWS})")
+    return rows
+
+def validate_bulk_rows(model, rows: List[dict]) -> tuple:
+    """Validate every row; returns ([(line, model)], errors), lines numbered from 1."""
+    valid = []
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            valid.append((number, model.model_validate(row)))
+        except ValidationError as e:
+            errors.append({"ligne": number, "erreurs": [
+                {"champ": ".".join(str(part) for part in err["loc"]), "message": err["msg"]}
+                for err in e.errors()
+            ]})
+    return valid, errors
+
+def reject_bulk(errors: List[dict]):
+    raise HTTPException(status_code=422, detail={"message": "Lot rejeté, aucune ligne appliquée", "erreurs": errors})
+
+@api_router.post("/admin/produits/import")
+async def admin_import_produits(request: Request, user: User = Depends(get_admin_user)):
+    """Create products from a CSV or JSON batch in a single bulk_write.
+
+    The whole batch is validated first; if any row is invalid nothing is
+    written and the per-row errors are returned.
+    """
+    rows = await read_bulk_rows(request)
+    produits, errors = validate_bulk_rows(ProduitCreate, rows)
+    if errors:
+        reject_bulk(errors)
     
-    photo_url = f"/uploads/produits/{file_name}"
-    photos = produit.get('photos', [])
-    photos.append(photo_url)
+    docs = [Produit(**produit.model_dump()).model_dump() for _, produit in produits]
+    await db.produits.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+    await bump_stats({"produits": len(docs)})
+    await catalog_cache.invalidate("produits")
+    return {
+        "created": len(docs),
+        "results": [{"ligne": number, "id": doc["id"], "statut": "cree"} for number, doc in enumerate(docs, start=1)]
+    }
+
+@api_router.post("/admin/produits/bulk-update")
+async def admin_bulk_update_produits(request: Request, user: User = Depends(get_admin_user)):
+    """Apply stock/price/visibility changes from a CSV or JSON batch.
+
+    `stock` sets the stock, `ajout_stock` increments it atomically (safe
+    alongside concurrent orders). Unknown ids fail validation of the whole
+    batch; otherwise all rows go out in one ordered bulk_write.
+    """
+    rows = await read_bulk_rows(request)
+    changes, errors = validate_bulk_rows(ProduitBulkUpdate, rows)
     
-    await db.produits.update_one({"id": produit_id}, {"$set": {"photos": photos}})
+    known_ids = set()
+    ids = list({change.id for _, change in changes})
+    async for doc in db.produits.find({"id": {"$in": ids}}, {"_id": 0, "id": 1}):
+        known_ids.add(doc["id"])
     
-    return {"photo_url": photo_url}
+    operations = []
+    for number, change in changes:
+        row_errors = []
+        if change.id not in known_ids:
+            row_errors.append({"champ": "id", "message": "Produit non trouvé"})
+        if change.stock is not None and change.ajout_stock is not None:
+            row_errors.append({"champ": "stock", "message": "stock et ajout_stock sont exclusifs"})
+        fields = change.model_dump(exclude_none=True, exclude={"id", "ajout_stock"})
+        if not fields and change.ajout_stock is None:
+            row_errors.append({"champ": "id", "message": "Aucun champ à mettre à jour"})
+        if row_errors:
+            errors.append({"ligne": number, "erreurs": row_errors})
+            continue
+        update = {}
+        if fields:
+            update["$set"] = fields
+        if change.ajout_stock is not None:
+            update["$inc"] = {"stock": change.ajout_stock}
+        operations.append((number, change.id, UpdateOne({"id": change.id}, update)))
+    if errors:
+        reject_bulk(sorted(errors, key=lambda e: e["ligne"]))
+    
+    result = await db.produits.bulk_write([op for _, _, op in operations], ordered=True)
+    await catalog_cache.invalidate("produits")
+    return {
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "results": [{"ligne": number, "id": produit_id, "statut": "mis_a_jour"} for number, produit_id, _ in operations]
+    }
 
 # Admin Routes - Animaux
 @api_router.get("/admin/animaux", response_model=List[Animal])
-async def admin_get_animaux(authorization: str = None):
-    animaux = await db.animaux.find({}, {"_id": 0}).to_list(1000)
-    for a in animaux:
-        if isinstance(a.get('created_at'), str):
-            a['created_at'] = datetime.fromisoformat(a['created_at'])
-    return animaux
+async def admin_get_animaux(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_admin_user)):
+    animaux = await paginate(db.animaux, {}, response, limit, cursor, order, Animal)
+    return list_response(Animal, animaux, response)
 
 @api_router.post("/admin/animaux", response_model=Animal)
 async def admin_create_animal(animal_data: AnimalCreate, user: User = Depends(get_admin_user)):
     animal = Animal(**animal_data.model_dump())
     doc = animal.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.animaux.insert_one(doc)
+    await bump_stats({"animaux": 1})
+    await catalog_cache.invalidate("animaux")
     return animal
 
 @api_router.put("/admin/animaux/{animal_id}", response_model=Animal)
 async def admin_update_animal(animal_id: str, animal_data: AnimalCreate, user: User = Depends(get_admin_user)):
-    existing = await db.animaux.find_one({"id": animal_id}, {"_id": 0})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Animal non trouvé")
-    
-    updated_data = animal_data.model_dump()
-    await db.animaux.update_one({"id": animal_id}, {"$set": updated_data})
-    
-    updated_animal = await db.animaux.find_one({"id": animal_id}, {"_id": 0})
-    if isinstance(updated_animal.get('created_at'), str):
-        updated_animal['created_at'] = datetime.fromisoformat(updated_animal['created_at'])
+    updated_animal = await update_document(db.animaux, animal_id, {"$set": animal_data.model_dump()}, "Animal non trouvé")
+    await catalog_cache.invalidate("animaux")
+    return Animal(**updated_animal)
+
+@api_router.patch("/admin/animaux/{animal_id}", response_model=Animal)
+async def admin_patch_animal(animal_id: str, animal_data: AnimalUpdate, user: User = Depends(get_admin_user)):
+    updated_animal = await update_document(db.animaux, animal_id, {"$set": update_fields(animal_data)}, "Animal non trouvé")
+    await catalog_cache.invalidate("animaux")
     return Animal(**updated_animal)
 
 @api_router.delete("/admin/animaux/{animal_id}")
@@ -611,55 +2538,46 @@ async def admin_delete_animal(animal_id: str, user: User = Depends(get_admin_use
     result = await db.animaux.delete_one({"id": animal_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Animal non trouvé")
+    await bump_stats({"animaux": -1})
+    await catalog_cache.invalidate("animaux")
     return {"success": True}
 
 @api_router.post("/admin/animaux/{animal_id}/upload-photo")
 async def upload_animal_photo(animal_id: str, file: UploadFile = File(...), user: User = Depends(get_admin_user)):
-    animal = await db.animaux.find_one({"id": animal_id}, {"_id": 0})
-    if not animal:
+    if not await db.animaux.count_documents({"id": animal_id}, limit=1):
         raise HTTPException(status_code=404, detail="Animal non trouvé")
     
-    file_ext = file.filename.split('.')[-1]
-    file_name = f"{uuid.uuid4()}.{file_ext}"
-    file_path = UPLOADS_DIR / "animaux" / file_name
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    photo_url = f"/uploads/animaux/{file_name}"
-    await db.animaux.update_one({"id": animal_id}, {"$set": {"photo": photo_url}})
+    photo_url, created = await save_upload(file, "animaux")
+    variants = await image_pipeline.variants(photo_url, discard_unreadable=created)
+    result = await db.animaux.update_one({"id": animal_id}, {"$set": {"photo": photo_url, "photo_variants": variants.model_dump()}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Animal non trouvé")
+    await catalog_cache.invalidate("animaux")
     
-    return {"photo_url": photo_url}
+    return {"photo_url": photo_url, "variants": variants}
 
 # Admin Routes - Cultures
 @api_router.get("/admin/cultures", response_model=List[Culture])
-async def admin_get_cultures(authorization: str = None):
-    cultures = await db.cultures.find({}, {"_id": 0}).to_list(1000)
-    for c in cultures:
-        if isinstance(c.get('created_at'), str):
-            c['created_at'] = datetime.fromisoformat(c['created_at'])
-    return cultures
+async def admin_get_cultures(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_admin_user)):
+    cultures = await paginate(db.cultures, {}, response, limit, cursor, order, Culture)
+    return list_response(Culture, cultures, response)
 
 @api_router.post("/admin/cultures", response_model=Culture)
 async def admin_create_culture(culture_data: CultureCreate, user: User = Depends(get_admin_user)):
     culture = Culture(**culture_data.model_dump())
     doc = culture.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.cultures.insert_one(doc)
+    await bump_stats({"cultures": 1})
     return culture
 
 @api_router.put("/admin/cultures/{culture_id}", response_model=Culture)
 async def admin_update_culture(culture_id: str, culture_data: CultureCreate, user: User = Depends(get_admin_user)):
-    existing = await db.cultures.find_one({"id": culture_id}, {"_id": 0})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Culture non trouvée")
-    
-    updated_data = culture_data.model_dump()
-    await db.cultures.update_one({"id": culture_id}, {"$set": updated_data})
-    
-    updated_culture = await db.cultures.find_one({"id": culture_id}, {"_id": 0})
-    if isinstance(updated_culture.get('created_at'), str):
-        updated_culture['created_at'] = datetime.fromisoformat(updated_culture['created_at'])
+    updated_culture = await update_document(db.cultures, culture_id, {"$set": culture_data.model_dump()}, "Culture non trouvée")
+    return Culture(**updated_culture)
+
+@api_router.patch("/admin/cultures/{culture_id}", response_model=Culture)
+async def admin_patch_culture(culture_id: str, culture_data: CultureUpdate, user: User = Depends(get_admin_user)):
+    updated_culture = await update_document(db.cultures, culture_id, {"$set": update_fields(culture_data)}, "Culture non trouvée")
     return Culture(**updated_culture)
 
 @api_router.delete("/admin/cultures/{culture_id}")
@@ -667,82 +2585,491 @@ async def admin_delete_culture(culture_id: str, user: User = Depends(get_admin_u
     result = await db.cultures.delete_one({"id": culture_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Culture non trouvée")
+    await bump_stats({"cultures": -1})
     return {"success": True}
 
 # Admin Routes - Reservations
 @api_router.get("/admin/reservations", response_model=List[Reservation])
-async def admin_get_reservations(authorization: str = None):
-    reservations = await db.reservations.find({}, {"_id": 0}).to_list(1000)
-    for r in reservations:
-        if isinstance(r.get('created_at'), str):
-            r['created_at'] = datetime.fromisoformat(r['created_at'])
-    return reservations
+async def admin_get_reservations(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_admin_user)):
+    reservations = await paginate(db.reservations, {}, response, limit, cursor, order, Reservation)
+    return list_response(Reservation, reservations, response)
 
 @api_router.put("/admin/reservations/{reservation_id}/statut")
 async def admin_update_reservation_status(reservation_id: str, statut: ReservationStatus, user: User = Depends(get_admin_user)):
-    result = await db.reservations.update_one({"id": reservation_id}, {"$set": {"statut": statut}})
-    if result.matched_count == 0:
+    reservation = await db.reservations.find_one({"id": reservation_id}, {"_id": 0})
+    if not reservation:
         raise HTTPException(status_code=404, detail="Réservation non trouvée")
+    
+    # Keep the slot counters in step with cancellations
+    visitors = reservation["nb_adultes"] + reservation["nb_enfants"]
+    was_cancelled = reservation["statut"] == ReservationStatus.ANNULEE
+    is_cancelled = statut == ReservationStatus.ANNULEE
+    if was_cancelled and not is_cancelled:
+        if not await reserve_slot(reservation["date_visite"], reservation["heure_visite"], visitors):
+            raise HTTPException(status_code=409, detail="Ce créneau est complet")
+    
+    result = await db.reservations.update_one({"id": reservation_id, "statut": reservation["statut"]}, {"$set": {"statut": statut}})
+    if result.matched_count == 0:
+        if was_cancelled and not is_cancelled:
+            await release_slot(reservation["date_visite"], reservation["heure_visite"], visitors)
+        raise HTTPException(status_code=409, detail="Réservation modifiée entre-temps, réessayez")
+    
+    if is_cancelled and not was_cancelled:
+        await release_slot(reservation["date_visite"], reservation["heure_visite"], visitors)
+        await rollup_reservation(reservation, -1)
+    elif was_cancelled and not is_cancelled:
+        await rollup_reservation(reservation, 1)
     return {"success": True}
 
 # Admin Routes - Commandes
 @api_router.get("/admin/commandes", response_model=List[Commande])
-async def admin_get_commandes(authorization: str = None):
-    commandes = await db.commandes.find({}, {"_id": 0}).to_list(1000)
-    for c in commandes:
-        if isinstance(c.get('created_at'), str):
-            c['created_at'] = datetime.fromisoformat(c['created_at'])
-        if isinstance(c.get('updated_at'), str):
-            c['updated_at'] = datetime.fromisoformat(c['updated_at'])
-    return commandes
+async def admin_get_commandes(response: Response, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT), cursor: Optional[str] = None, order: SortOrder = SortOrder.DESC, user: User = Depends(get_admin_user)):
+    commandes = await paginate(db.commandes, {}, response, limit, cursor, order, Commande)
+    return list_response(Commande, commandes, response)
 
 @api_router.put("/admin/commandes/{commande_id}/statut")
 async def admin_update_commande_status(commande_id: str, statut: CommandeStatus, user: User = Depends(get_admin_user)):
-    updated_at = datetime.now(timezone.utc).isoformat()
-    result = await db.commandes.update_one({"id": commande_id}, {"$set": {"statut": statut, "updated_at": updated_at}})
-    if result.matched_count == 0:
+    updated_at = datetime.now(timezone.utc)
+    previous = await db.commandes.find_one_and_update(
+        {"id": commande_id},
+        {"$set": {"statut": statut, "updated_at": updated_at}},
+        projection={"_id": 0, "statut": 1, "total": 1, "created_at": 1, "items": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous:
         raise HTTPException(status_code=404, detail="Commande non trouvée")
+    previous_statut = CommandeStatus(previous["statut"])
+    if previous_statut != statut:
+        await bump_stats({
+            f"commandes_by_statut.{previous_statut.value}": -1,
+            f"commandes_by_statut.{statut.value}": 1,
+            f"revenue_by_statut.{previous_statut.value}": -previous["total"],
+            f"revenue_by_statut.{statut.value}": previous["total"]
+        })
+        # Cancelled orders do not count in the sales rollups
+        if statut == CommandeStatus.ANNULEE:
+            await rollup_commande(previous, -1)
+        elif previous_statut == CommandeStatus.ANNULEE:
+            await rollup_commande(previous, 1)
     return {"success": True}
 
+# Admin Exports
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+EXPORT_COLUMNS = {
+    "reservations": ["id", "created_at", "statut", "user_id", "user_name", "user_email", "user_telephone",
+                     "date_visite", "heure_visite", "type_visite", "nb_adultes", "nb_enfants", "prix_total"],
+    "commandes": ["id", "created_at", "updated_at", "statut", "user_id", "user_name", "user_email", "user_telephone",
+                  "mode_retrait", "adresse_livraison", "total", "items"],
+}
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+def _export_query(date_from: Optional[str], date_to: Optional[str], statut: Optional[str]) -> dict:
+    """Build the export filter; `from`/`to` are inclusive UTC days.
+
+    Documents not yet converted by migrate_dates.py keep created_at as an
+    ISO string (UTC), which a date range never matches, so the same days
+    are also matched as a string range.
+    """
+    query = {}
+    created_at = {}
+    created_at_text = {}
+    try:
+        if date_from:
+            created_at["$gte"] = datetime.strptime(date_from, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            created_at_text["$gte"] = created_at["$gte"].date().isoformat()
+        if date_to:
+            created_at["$lt"] = datetime.strptime(date_to, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+            created_at_text["$lt"] = created_at["$lt"].date().isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates invalides (AAAA-MM-JJ)")
+    if created_at:
+        query["$or"] = [{"created_at": created_at}, {"created_at": created_at_text}]
+    if statut:
+        query["statut"] = statut
+    return query
+
+async def stream_export(collection_name: str, query: dict, export_format: ExportFormat):
+    """Yield the matching documents as NDJSON or CSV, one cursor batch per chunk.
+
+    Only one batch is held in memory at a time, whatever the export size.
+    """
+    columns = EXPORT_COLUMNS[collection_name]
+    projection = {"_id": 0, **{column: 1 for column in columns}}
+    cursor = db[collection_name].find(query, projection).sort([("created_at", ASCENDING), ("id", ASCENDING)]).batch_size(EXPORT_BATCH_SIZE)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == ExportFormat.CSV:
+        writer.writerow(columns)
+    rows = 0
+    async for doc in cursor:
+        if export_format == ExportFormat.CSV:
+            row = [_export_value(doc.get(column, "")) for column in columns]
+            if collection_name == "commandes":
+                row[-1] = json.dumps(doc.get("items", []), ensure_ascii=False)
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({k: _export_value(v) for k, v in doc.items()}, ensure_ascii=False))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def export_response(collection_name: str, query: dict, export_format: ExportFormat) -> StreamingResponse:
+    media_type = "text/csv; charset=utf-8" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    filename = f"{collection_name}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.{export_format.value}"
+    return StreamingResponse(
+        stream_export(collection_name, query, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/export/reservations")
+async def admin_export_reservations(
+    format: ExportFormat = ExportFormat.NDJSON,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    statut: Optional[ReservationStatus] = None,
+    user: User = Depends(get_admin_user)
+):
+    query = _export_query(date_from, date_to, statut.value if statut else None)
+    return export_response("reservations", query, format)
+
+@api_router.get("/admin/export/commandes")
+async def admin_export_commandes(
+    format: ExportFormat = ExportFormat.NDJSON,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    statut: Optional[CommandeStatus] = None,
+    user: User = Depends(get_admin_user)
+):
+    query = _export_query(date_from, date_to, statut.value if statut else None)
+    return export_response("commandes", query, format)
+
+@api_router.get("/admin/rate-limits")
+async def admin_get_rate_limit_stats(user: User = Depends(get_admin_user)):
+    return auth_limiter.stats()
+
+@api_router.get("/admin/cache/users")
+async def admin_get_user_cache_stats(user: User = Depends(get_admin_user)):
+    return user_cache.stats()
+
+@api_router.get("/admin/email-outbox")
+async def admin_get_email_outbox(user: User = Depends(get_admin_user)):
+    return await email_outbox.backlog()
+
+@api_router.get("/admin/cache/catalog")
+async def admin_get_catalog_cache_stats(user: User = Depends(get_admin_user)):
+    return catalog_cache.stats()
+
 # Admin Dashboard Stats
 @api_router.get("/admin/stats")
-async def admin_get_stats(authorization: str = None):
-    total_produits = await db.produits.count_documents({})
-    total_animaux = await db.animaux.count_documents({})
-    total_cultures = await db.cultures.count_documents({})
-    total_reservations = await db.reservations.count_documents({})
-    total_commandes = await db.commandes.count_documents({})
-    
-    reservations_today = await db.reservations.count_documents({
-        "date_visite": datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    })
+async def admin_get_stats(user: User = Depends(get_admin_user)):
+    counters, reservations_today = await asyncio.gather(
+        db.stats_counters.find_one({"_id": STATS_COUNTERS_ID}),
+        db.reservations.count_documents({
+            "date_visite": datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        })
+    )
+    # Counters are seeded at startup and recomputed through POST /admin/stats/rebuild
+    counters = counters or {}
     
+    revenue_by_statut = {k: round(v, 2) for k, v in counters.get("revenue_by_statut", {}).items()}
     return {
-        "total_produits": total_produits,
-        "total_animaux": total_animaux,
-        "total_cultures": total_cultures,
-        "total_reservations": total_reservations,
-        "total_commandes": total_commandes,
-        "reservations_today": reservations_today
+        "total_produits": counters.get("produits", 0),
+        "total_animaux": counters.get("animaux", 0),
+        "total_cultures": counters.get("cultures", 0),
+        "total_reservations": counters.get("reservations", 0),
+        "total_commandes": counters.get("commandes", 0),
+        "reservations_today": reservations_today,
+        "commandes_by_statut": {k: v for k, v in counters.get("commandes_by_statut", {}).items() if v},
+        "revenue_by_statut": {k: v for k, v in revenue_by_statut.items() if v},
+        "revenue_total": round(sum(v for k, v in revenue_by_statut.items() if k != CommandeStatus.ANNULEE.value), 2),
+        "counters_rebuilt_at": counters.get("rebuilt_at")
     }
 
+# Admin Analytics
+class Granularite(str, Enum):
+    JOUR = "jour"
+    MOIS = "mois"
+
+def _analytics_range(date_from: str, date_to: str) -> tuple:
+    try:
+        first_day = datetime.strptime(date_from, "%Y-%m-%d").date()
+        last_day = datetime.strptime(date_to, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates invalides (AAAA-MM-JJ)")
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="La date de fin précède la date de début")
+    return first_day.isoformat(), last_day.isoformat()
+
+def _period(day: str, granularite: Granularite) -> str:
+    return day[:7] if granularite == Granularite.MOIS else day
+
+@api_router.get("/admin/analytics/ventes")
+async def admin_analytics_ventes(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    granularite: Granularite = Granularite.JOUR,
+    user: User = Depends(get_admin_user)
+):
+    first_day, last_day = _analytics_range(date_from, date_to)
+    periods = {}
+    async for day in db.stats_daily.find({"_id": {"$gte": first_day, "$lte": last_day}, "commandes": {"$gt": 0}}, {"commandes": 1, "revenue": 1}).sort("_id", ASCENDING):
+        period = periods.setdefault(_period(day["_id"], granularite), {"commandes": 0, "revenue": 0.0})
+        period["commandes"] += day.get("commandes", 0)
+        period["revenue"] += day.get("revenue", 0.0)
+    return [
+        {"periode": key, "commandes": value["commandes"], "revenue": round(value["revenue"], 2)}
+        for key, value in periods.items()
+    ]
+
+@api_router.get("/admin/analytics/top-produits")
+async def admin_analytics_top_produits(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    limit: int = Query(10, ge=1, le=100),
+    user: User = Depends(get_admin_user)
+):
+    first_day, last_day = _analytics_range(date_from, date_to)
+    pipeline = [
+        {"$match": {"day": {"$gte": first_day, "$lte": last_day}}},
+        # Chronological, so $last reports the most recent name and unit
+        {"$sort": {"day": 1}},
+        {"$group": {
+            "_id": "$produit_id",
+            "nom": {"$last": "$nom"},
+            "unite": {"$last": "$unite"},
+            "quantite": {"$sum": "$quantite"},
+            "revenue": {"$sum": "$revenue"}
+        }},
+        {"$match": {"quantite": {"$gt": 0}}},
+        {"$sort": {"quantite": -1}},
+        {"$limit": limit}
+    ]
+    rows = await db.stats_daily_produits.aggregate(pipeline).to_list(limit)
+    return [
+        {"produit_id": row["_id"], "nom": row["nom"], "unite": row["unite"], "quantite": row["quantite"], "revenue": round(row["revenue"], 2)}
+        for row in rows
+    ]
+
+@api_router.get("/admin/analytics/frequentation")
+async def admin_analytics_frequentation(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    granularite: Granularite = Granularite.JOUR,
+    user: User = Depends(get_admin_user)
+):
+    first_day, last_day = _analytics_range(date_from, date_to)
+    periods = {}
+    async for day in db.stats_daily.find({"_id": {"$gte": first_day, "$lte": last_day}, "reservations": {"$gt": 0}}, {"reservations": 1, "visiteurs": 1}).sort("_id", ASCENDING):
+        period = periods.setdefault(_period(day["_id"], granularite), {"reservations": 0, "visiteurs": {}})
+        period["reservations"] += day.get("reservations", 0)
+        for type_visite, counts in day.get("visiteurs", {}).items():
+            totals = period["visiteurs"].setdefault(type_visite, {"adultes": 0, "enfants": 0})
+            totals["adultes"] += counts.get("adultes", 0)
+            totals["enfants"] += counts.get("enfants", 0)
+    return [{"periode": key, **value} for key, value in periods.items()]
+
+@api_router.post("/admin/stats/rebuild")
+async def admin_rebuild_stats(user: User = Depends(get_admin_user)):
+    await rebuild_stats_counters()
+    return {"success": True}
+
+# Admin profiling
+def _profile_requested(scope) -> bool:
+    if b"profile=" in scope.get("query_string", b""):
+        for pair in scope["query_string"].split(b"&"):
+            if pair in (b"profile=1", b"profile=true"):
+                return True
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value in (b"1", b"true")
+    return False
+
+class ProfilingMiddleware:
+    """Profile a single request when an admin sends X-Profile: 1 or ?profile=1.
+
+    The request runs under cProfile and the Mongo commands it issues are
+    collected through the command listener. The report (wall, event-loop
+    CPU, Mongo and other waiting time, command list, top functions) is
+    stored in the `profiles` collection and its id returned in the
+    X-Profile-Id header. cProfile sees the whole event loop thread, so
+    other requests running concurrently show up in the function stats.
+    Only one profile runs at a time (cProfile is one hook per thread);
+    an overlapping profiled request gets a 409.
+    When the flag is absent the cost is one scan of the request headers.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        credentials = await security(request)
+        try:
+            user = await get_admin_user(await get_current_user(credentials))
+        except HTTPException as e:
+            await JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)(scope, receive, send)
+            return
+        if self.busy:
+            await JSONResponse({"detail": "Un profilage est déjà en cours"}, status_code=409)(scope, receive, send)
+            return
+        
+        profile_id = str(uuid.uuid4())
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode("ascii"))]}
+            await send(message)
+
+        self.busy = True
+        profile = RequestProfile()
+        token = active_profile.set(profile)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            profiler.enable()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            cpu_seconds = time.thread_time() - cpu_started
+            wall_seconds = time.perf_counter() - started
+            active_profile.reset(token)
+            self.busy = False
+            
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(40)
+            query_string = scope.get("query_string", b"").decode("latin-1")
+            try:
+                await db.profiles.insert_one({
+                    "id": profile_id,
+                    "method": scope["method"],
+                    "path": scope["path"] + (f"?{query_string}" if query_string else ""),
+                    "route": getattr(scope.get("route"), "path", None),
+                    "status": status,
+                    "user_id": user.id,
+                    "wall_ms": round(wall_seconds * 1000, 3),
+                    "cpu_ms": round(cpu_seconds * 1000, 3),
+                    "mongo_ms": round(profile.mongo_seconds * 1000, 3),
+                    "waiting_ms": round(max(0.0, wall_seconds - cpu_seconds) * 1000, 3),
+                    "mongo_commands": profile.mongo_count,
+                    "commands": profile.commands,
+                    "stats": stream.getvalue(),
+                    "created_at": datetime.now(timezone.utc),
+                })
+            except Exception as e:
+                logger.error(f"Failed to store profile {profile_id}: {e}")
+
+@api_router.get("/admin/profiles")
+async def admin_get_profiles(limit: int = Query(20, ge=1, le=100), user: User = Depends(get_admin_user)):
+    return await db.profiles.find({}, {"_id": 0, "commands": 0, "stats": 0}).sort("created_at", DESCENDING).to_list(limit)
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def admin_get_profile(profile_id: str, format: Optional[str] = None, user: User = Depends(get_admin_user)):
+    profile = await db.profiles.find_one({"id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profil non trouvé")
+    if format == "text":
+        return Response(profile["stats"], media_type="text/plain; charset=utf-8")
+    return profile
+
 # Include router
 app.include_router(api_router)
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+app.add_middleware(UploadLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Content-Disposition", "Idempotent-Replayed", "X-Profile-Id"],
 )
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token invalide")
+    lines = []
+    for metric in (http_request_duration, http_responses, mongo_command_duration, mongo_command_documents, mongo_command_failures):
+        lines.extend(metric.render())
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_ensure_indexes():
+    if not ENSURE_INDEXES_ON_STARTUP:
+        return
+    # Every worker runs this: only create what is missing, never drop
+    try:
+        report = await ensure_indexes(db, rebuild=False)
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+        return
+    for entry in report:
+        label = f"Index {entry['collection']}.{entry['index']}"
+        if entry["action"] == "mismatch":
+            logger.warning(f"{label} differs from its definition; run create_indexes.py to rebuild it")
+        elif entry["action"] == "failed":
+            logger.error(f"{label} could not be built: {entry['error']}")
+        elif entry["action"] != "exists":
+            logger.info(f"{label} {entry['action']} in {entry['seconds']}s")
+
+@app.on_event("startup")
+async def startup_stats_counters():
+    # First deploy (or counters created by bump_stats before any rebuild):
+    # seed them once here rather than on the request path
+    try:
+        counters = await db.stats_counters.find_one({"_id": STATS_COUNTERS_ID}, {"rebuilt_at": 1})
+        if not counters or "rebuilt_at" not in counters:
+            await rebuild_stats_counters()
+            logger.info("Dashboard counters rebuilt")
+    except Exception as e:
+        logger.error(f"Dashboard counters rebuild failed: {e}")
+
+@app.on_event("startup")
+async def startup_email_worker():
+    if EMAIL_WORKER_ENABLED:
+        email_outbox.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await email_outbox.stop()
+    client.close()
+    password_pool.shutdown()
+    image_pipeline.shutdown()
\ No newline at end of file
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# server.py reads its settings at import time; point it at a local test
+# database before any test imports it (.env does not override these)
+os.environ["MONGO_URL"] = os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("TEST_DB_NAME", "mikombo_test")
+os.environ.setdefault("BREVO_API_KEY", "")
+# benchmarks/harness.py drives the app against this database and drops it on setup
+os.environ["BENCH_MONGO_URL"] = os.environ["MONGO_URL"]
+os.environ["BENCH_DB_NAME"] = os.environ["DB_NAME"]
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """One loop for the session: the Motor client in server.py is shared by all tests."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest.fixture(scope="session")
+def mongod():
+    """Skip tests needing a real mongod (mongomock runs each operation atomically,
+    so it cannot reproduce the races these tests are about)."""
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    probe = MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=500)
+    try:
+        probe.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"no mongod reachable at {os.environ['MONGO_URL']}")
+    finally:
+        probe.close()
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """Point server.db at a fresh mongomock-motor database."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    database = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "db", database)
+    return database
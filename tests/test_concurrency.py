@@ -0,0 +1,18 @@
+"""Concurrency invariants under parallel requests, against a real mongod.
+
+These run the load scripts from benchmarks/ with modest sizes. They are
+skipped when no mongod is reachable (TEST_MONGO_URL, default
+mongodb://localhost:27017); the scripts' --memory mode cannot replace them.
+"""
+import load_idempotency
+import load_stock_oversell
+import load_visit_capacity
+
+def test_stock_never_oversold(event_loop, mongod):
+    assert event_loop.run_until_complete(load_stock_oversell.run(orders=200, stock=25, users=20, memory=False))
+
+def test_visit_capacity_never_exceeded(event_loop, mongod):
+    assert event_loop.run_until_complete(load_visit_capacity.run(bookings=200, users=20, memory=False))
+
+def test_idempotency_key_runs_once(event_loop, mongod):
+    assert event_loop.run_until_complete(load_idempotency.run(keys=10, duplicates=8, memory=False))
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from server import EmailOutbox, FakeEmailTransport, Reservation
+
+def make_outbox(transport, max_attempts=3, backoff_seconds=10.0, lease_seconds=60.0):
+    return EmailOutbox(
+        transport,
+        batch_size=10,
+        concurrency=2,
+        max_attempts=max_attempts,
+        poll_seconds=1.0,
+        lease_seconds=lease_seconds,
+        backoff_seconds=backoff_seconds
+    )
+
+def reservation_data():
+    return Reservation(
+        user_id="u1",
+        user_name="Jean Dupont",
+        user_email="jean@example.com",
+        user_telephone="+243000000000",
+        date_visite="2026-12-01",
+        heure_visite="10:00",
+        type_visite="standard",
+        nb_adultes=2,
+        nb_enfants=1,
+        prix_total=25
+    ).model_dump(mode="json")
+
+def utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+async def make_due(database, job_id: str):
+    await database.email_outbox.update_one({"id": job_id}, {"$set": {"next_attempt_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+
+def test_enqueue_then_send(event_loop, memory_db):
+    transport = FakeEmailTransport()
+    outbox = make_outbox(transport)
+
+    async def scenario():
+        job_id = await outbox.enqueue("reservation_confirmation", reservation_data())
+        assert await outbox.run_once() == 1
+        return await memory_db.email_outbox.find_one({"id": job_id})
+
+    job = event_loop.run_until_complete(scenario())
+    assert job["status"] == "sent"
+    assert job["attempts"] == 1
+    assert "claim" not in job
+    assert len(transport.sent) == 1
+    assert transport.sent[0]["to"][0]["email"] == "jean@example.com"
+    assert outbox.sent == 1
+
+def test_failure_is_retried_with_backoff(event_loop, memory_db):
+    transport = FakeEmailTransport(fail_times=1)
+    outbox = make_outbox(transport, backoff_seconds=10.0)
+
+    async def scenario():
+        job_id = await outbox.enqueue("reservation_confirmation", reservation_data())
+        before = datetime.now(timezone.utc)
+        await outbox.run_once()
+        retried = await memory_db.email_outbox.find_one({"id": job_id})
+        # Not due yet: nothing to claim
+        handled_early = await outbox.run_once()
+        await make_due(memory_db, job_id)
+        await outbox.run_once()
+        sent = await memory_db.email_outbox.find_one({"id": job_id})
+        return before, retried, handled_early, sent
+
+    before, retried, handled_early, sent = event_loop.run_until_complete(scenario())
+    assert retried["status"] == "pending"
+    assert retried["attempts"] == 1
+    assert retried["last_error"] == "Fake transport failure"
+    # First retry waits backoff_seconds with +/-20% jitter
+    delay = (utc(retried["next_attempt_at"]) - before).total_seconds()
+    assert 8 - 1 <= delay <= 12 + 1
+    assert handled_early == 0
+    assert sent["status"] == "sent"
+    assert sent["attempts"] == 2
+    assert outbox.retried == 1
+
+def test_failed_after_max_attempts(event_loop, memory_db):
+    transport = FakeEmailTransport(fail_times=10)
+    outbox = make_outbox(transport, max_attempts=2)
+
+    async def scenario():
+        job_id = await outbox.enqueue("reservation_confirmation", reservation_data())
+        await outbox.run_once()
+        await make_due(memory_db, job_id)
+        await outbox.run_once()
+        await make_due(memory_db, job_id)
+        handled_after = await outbox.run_once()
+        return await memory_db.email_outbox.find_one({"id": job_id}), handled_after
+
+    job, handled_after = event_loop.run_until_complete(scenario())
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert handled_after == 0
+    assert transport.sent == []
+    assert outbox.failed == 1
+
+@pytest.mark.parametrize("lease_expired, expected_status", [(True, "sent"), (False, "sending")])
+def test_expired_lease_is_reclaimed(event_loop, memory_db, lease_expired, expected_status):
+    transport = FakeEmailTransport()
+    outbox = make_outbox(transport)
+
+    async def scenario():
+        job_id = await outbox.enqueue("reservation_confirmation", reservation_data())
+        # As left by a worker that crashed mid-send
+        offset = timedelta(seconds=-5 if lease_expired else 60)
+        await memory_db.email_outbox.update_one({"id": job_id}, {"$set": {
+            "status": "sending", "claim": "crashed-worker", "locked_until": datetime.now(timezone.utc) + offset
+        }})
+        handled = await outbox.run_once()
+        return await memory_db.email_outbox.find_one({"id": job_id}), handled
+
+    job, handled = event_loop.run_until_complete(scenario())
+    assert job["status"] == expected_status
+    assert handled == (1 if lease_expired else 0)
+    assert len(transport.sent) == handled
@@ -0,0 +1,46 @@
+import pytest
+
+from server import Commande, CommandeItem, Reservation, _amount, email_service
+
+@pytest.mark.parametrize("value, expected", [
+    (0, "0.00"),
+    (2.5, "2.50"),
+    (12345.67, "12345.67"),
+    (123456.78, "123456.78"),
+    (1234567, "1234567.00"),
+])
+def test_amount_keeps_every_digit(value, expected):
+    assert _amount(value) == expected
+
+def test_commande_confirmation_large_amounts():
+    commande = Commande(
+        user_id="u1",
+        user_name="Jean Dupont",
+        user_email="jean@example.com",
+        user_telephone="+243000000000",
+        items=[CommandeItem(produit_id="p1", nom="Boeuf", prix=12345.67, quantite=10, unite="kg")],
+        mode_retrait="retrait",
+        total=123456.7
+    )
+    email = email_service.commande_confirmation(commande)
+    for content in (email["html_content"], email["text_content"]):
+        assert "12345.67" in content
+        assert "123456.70" in content
+        assert "e+" not in content
+
+def test_reservation_confirmation_large_amount():
+    reservation = Reservation(
+        user_id="u1",
+        user_name="Jean Dupont",
+        user_email="jean@example.com",
+        user_telephone="+243000000000",
+        date_visite="2026-12-01",
+        heure_visite="10:00",
+        type_visite="scolaire",
+        nb_adultes=3,
+        nb_enfants=400,
+        prix_total=1234567
+    )
+    email = email_service.reservation_confirmation(reservation)
+    assert "1234567.00" in email["text_content"]
+    assert "1234567.00" in email["html_content"]
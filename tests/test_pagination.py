@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+from server import SortOrder, decode_cursor, encode_cursor, keyset_condition, paginate
+
+WHEN = datetime(2025, 3, 1, 10, 30, tzinfo=timezone.utc)
+
+def raw_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+@pytest.mark.parametrize("created_at", [WHEN, WHEN.isoformat()])
+def test_cursor_round_trip_keeps_type(created_at):
+    decoded = decode_cursor(encode_cursor({"created_at": created_at, "id": "abc"}))
+    assert decoded == (created_at, "abc")
+    assert type(decoded[0]) is type(created_at)
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    raw_cursor(["x", "2025-03-01", "abc"]),
+    raw_cursor(["d", "not a date", "abc"]),
+    raw_cursor(["d", "2025-03-01"]),
+    raw_cursor({"created_at": "2025-03-01"}),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+
+@pytest.mark.parametrize("created_at, order, op, bridge", [
+    (WHEN, SortOrder.ASC, "$gt", None),
+    (WHEN, SortOrder.DESC, "$lt", {"created_at": {"$type": "string"}}),
+    (WHEN.isoformat(), SortOrder.ASC, "$gt", {"created_at": {"$type": "date"}}),
+    (WHEN.isoformat(), SortOrder.DESC, "$lt", None),
+])
+def test_keyset_condition_bridges_to_the_next_type(created_at, order, op, bridge):
+    cursor = encode_cursor({"created_at": created_at, "id": "abc"})
+    expected = [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: "abc"}}
+    ]
+    if bridge:
+        expected.append(bridge)
+    assert keyset_condition(cursor, order) == {"$or": expected}
+
+@pytest.mark.parametrize("order", [SortOrder.ASC, SortOrder.DESC])
+def test_paginate_walks_mixed_created_at_types(event_loop, memory_db, order):
+    docs = []
+    for i in range(7):
+        created_at = WHEN + timedelta(days=i)
+        docs.append({"id": f"{i}", "created_at": created_at.isoformat() if i % 2 else created_at})
+
+    async def walk():
+        await memory_db.things.insert_many(docs)
+        seen, cursor = [], None
+        while True:
+            response = Response()
+            page = await paginate(memory_db.things, {}, response, 2, cursor, order)
+            seen.extend(doc["id"] for doc in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return seen
+
+    seen = event_loop.run_until_complete(walk())
+    assert sorted(seen) == [doc["id"] for doc in docs]
+    assert len(seen) == len(docs)
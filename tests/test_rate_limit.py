@@ -0,0 +1,107 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import server
+from server import AuthRateLimiter
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server.time, "monotonic", clock)
+    return clock
+
+def make_request(ip: str = "10.0.0.1") -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/api/auth/login", "headers": [], "client": (ip, 1234)})
+
+def test_burst_is_exhausted_then_refills(clock):
+    limiter = AuthRateLimiter("memory", {}, max_keys=10)
+    # burst 3, one token every 10 seconds
+    assert [limiter._take_memory("k", 3, 0.1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter._take_memory("k", 3, 0.1) == pytest.approx(10.0)
+    clock.now += 5
+    assert limiter._take_memory("k", 3, 0.1) == pytest.approx(5.0)
+    clock.now += 5
+    assert limiter._take_memory("k", 3, 0.1) == 0.0
+    # Refill never exceeds the burst size
+    clock.now += 3600
+    assert [limiter._take_memory("k", 3, 0.1) for _ in range(4)][-1] > 0
+
+def test_lru_evicts_oldest_key_at_max_keys(clock):
+    limiter = AuthRateLimiter("memory", {}, max_keys=2)
+    limiter._take_memory("a", 1, 0.01)
+    limiter._take_memory("b", 1, 0.01)
+    # Touching "a" makes "b" the least recently used
+    assert limiter._take_memory("a", 1, 0.01) > 0
+    limiter._take_memory("c", 1, 0.01)
+    assert list(limiter._buckets) == ["a", "c"]
+    # "b" was evicted, so it starts again with a full bucket
+    assert limiter._take_memory("b", 1, 0.01) == 0.0
+    assert len(limiter._buckets) == 2
+
+def test_check_rejects_with_retry_after(event_loop, clock):
+    limiter = AuthRateLimiter("memory", {"ip": (2, 6), "email": (100, 600)}, max_keys=100)
+    for _ in range(2):
+        event_loop.run_until_complete(limiter.check(make_request(), "login", "a@example.com"))
+    with pytest.raises(HTTPException) as excinfo:
+        event_loop.run_until_complete(limiter.check(make_request(), "login", "b@example.com"))
+    # 6 per minute: the next token is 10 seconds away
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "10"
+    clock.now += 9.5
+    with pytest.raises(HTTPException) as excinfo:
+        event_loop.run_until_complete(limiter.check(make_request(), "login", "b@example.com"))
+    assert excinfo.value.headers["Retry-After"] == "1"
+    # Another IP is unaffected
+    event_loop.run_until_complete(limiter.check(make_request("10.0.0.2"), "login", "b@example.com"))
+    assert limiter.rejected == {"ip": 2, "email": 0}
+    assert limiter.rejected_by_route == {"login": 2}
+    assert limiter.allowed == 3
+
+def test_check_limits_each_email_across_ips(event_loop, clock):
+    limiter = AuthRateLimiter("memory", {"ip": (100, 600), "email": (1, 1)}, max_keys=100)
+    event_loop.run_until_complete(limiter.check(make_request("10.0.0.1"), "login", "Victim@Example.com"))
+    with pytest.raises(HTTPException) as excinfo:
+        event_loop.run_until_complete(limiter.check(make_request("10.0.0.2"), "login", " victim@example.com"))
+    assert excinfo.value.headers["Retry-After"] == "60"
+
+class RecordingPasswordPool:
+    def __init__(self):
+        self.calls = []
+
+    async def hash(self, password: str) -> str:
+        self.calls.append("hash")
+        return "hashed"
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        self.calls.append("verify")
+        return False
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/auth/login", {"email": "b@example.com", "password": "wrong-password"}),
+    ("/api/auth/register", {"email": "a@example.com", "password": "pw123456", "nom": "N", "prenom": "P", "telephone": "1"}),
+])
+def test_rejected_before_password_pool(event_loop, memory_db, monkeypatch, path, body):
+    pool = RecordingPasswordPool()
+    monkeypatch.setattr(server, "password_pool", pool)
+    monkeypatch.setattr(server, "auth_limiter", AuthRateLimiter("memory", {"ip": (1, 1), "email": (100, 600)}, max_keys=100))
+    event_loop.run_until_complete(memory_db.users.insert_one({"id": "u1", "email": "b@example.com", "password_hash": "hashed", "role": "client"}))
+    client = TestClient(server.app)
+
+    first = client.post(path, json=body)
+    calls_after_first = len(pool.calls)
+    second = client.post(path, json=body)
+
+    assert first.status_code != 429
+    assert calls_after_first == 1
+    assert second.status_code == 429
+    assert "retry-after" in second.headers
+    assert len(pool.calls) == calls_after_first